@@ -0,0 +1,46 @@
+import copy
+import logging
+
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+
+from .cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+token_cache = LRUCache(settings.TOKEN_CACHE_SIZE, settings.TOKEN_CACHE_TTL)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that keeps the token and its user in a per-process
+    cache instead of joining authtoken_token and users_user per request.
+
+    Entries are dropped when the token is deleted or the user is saved in
+    this process, other processes see the change once the ttl has passed.
+    The cached user may be that old, its full saves leave the counters to
+    the signals through PreserveDenormalizedFieldsMixin.
+    """
+
+    cache = token_cache
+
+    def authenticate_credentials(self, key):
+        entry = self.cache.get(key)
+        if entry is None:
+            entry = super().authenticate_credentials(key)
+            self.cache.set(key, entry)
+        self.log_stats()
+        user, token = entry
+        return copy.copy(user), token
+
+    def log_stats(self):
+        stats = self.cache.stats()
+        lookups = stats["hits"] + stats["misses"]
+        interval = settings.TOKEN_CACHE_STATS_INTERVAL
+        if interval and lookups % interval == 0:
+            logger.info(
+                "token cache: hit rate %.2f, %d/%d entries",
+                stats["hit_rate"],
+                stats["size"],
+                stats["maxsize"],
+            )
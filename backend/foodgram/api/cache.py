@@ -0,0 +1,107 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from django.db.models.signals import post_delete, post_save
+from django.utils.http import quote_etag
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class LRUCache:
+    """
+    Bounded in-process cache, the least recently used entry is evicted first.
+    With a ttl entries also expire that many seconds after they were set.
+    """
+
+    def __init__(self, maxsize=128, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                self.misses += 1
+                return default
+            value, expires_at = self._data[key]
+            if expires_at is not None and time.monotonic() >= expires_at:
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        expires_at = None
+        if self.ttl is not None:
+            expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+            }
+
+
+class CatalogCache:
+    """
+    Per-process copy of a small read-mostly catalog with a strong ETag.
+
+    Saving or deleting a row of the model in this process drops the copy,
+    other processes rebuild it once the ttl has passed.
+    """
+
+    def __init__(self, model, ttl):
+        self.ttl = ttl
+        self._entry = None
+        self._loaded_at = None
+        self._lock = Lock()
+        post_save.connect(self.invalidate, sender=model, weak=False)
+        post_delete.connect(self.invalidate, sender=model, weak=False)
+
+    def invalidate(self, **kwargs):
+        with self._lock:
+            self._entry = None
+
+    def get(self, build):
+        """
+        Return ``(etag, data)``, calling ``build`` for the data when the
+        cached copy is missing or expired.
+        """
+        with self._lock:
+            if (
+                self._entry is None
+                or time.monotonic() - self._loaded_at > self.ttl
+            ):
+                data = build()
+                content = json.dumps(data, sort_keys=True, cls=JSONEncoder)
+                digest = hashlib.sha256(content.encode()).hexdigest()
+                self._entry = (quote_etag(digest), data)
+                self._loaded_at = time.monotonic()
+            return self._entry
@@ -0,0 +1,51 @@
+import calendar
+import hashlib
+
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import http_date, quote_etag
+
+
+def get_validators(request, modified_at, *parts):
+    """
+    ETag and Last-Modified timestamp of a recipe response.
+
+    Recipes carry the user's favorites, shopping cart and subscriptions, so
+    their modification time is part of both validators. It is reloaded as
+    the authenticated user may come from the token cache.
+    """
+    user = request.user
+    if not user.is_anonymous:
+        user.refresh_from_db(fields=["relations_modified_at"])
+        relations_modified_at = user.relations_modified_at
+        if relations_modified_at is not None and (
+            modified_at is None or relations_modified_at > modified_at
+        ):
+            modified_at = relations_modified_at
+    key = repr((parts, user.pk, modified_at))
+    etag = quote_etag(hashlib.sha256(key.encode()).hexdigest())
+    last_modified = None
+    if modified_at is not None:
+        last_modified = calendar.timegm(modified_at.utctimetuple())
+    return etag, last_modified
+
+
+def conditional_response(request, etag, last_modified):
+    """
+    Return a 304 response when the client's copy is still fresh.
+    """
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified):
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ("Authorization",))
+    return response
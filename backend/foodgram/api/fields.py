@@ -0,0 +1,55 @@
+import hashlib
+
+from drf_extra_fields.fields import Base64ImageField
+from rest_framework import serializers
+
+
+def build_url(field, name, storage):
+    url = storage.url(name)
+    request = field.context.get("request")
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
+
+
+class ContentHashImageField(Base64ImageField):
+    """
+    Base64 image named after the hash of its decoded content, identical
+    uploads end up in one file.
+    """
+
+    def get_file_name(self, decoded_file):
+        return hashlib.sha256(decoded_file).hexdigest()
+
+
+class ImageVariantsField(serializers.Field):
+    """
+    URLs of the generated image variants, empty until they are ready.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs["source"] = "*"
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        return {
+            variant: build_url(self, name, recipe.image.storage)
+            for variant, name in recipe.image_variants.items()
+        }
+
+
+class ThumbnailField(serializers.Field):
+    """
+    URL of the thumbnail variant, the original image until it is ready.
+    """
+
+    def __init__(self, variant="thumbnail", **kwargs):
+        self.variant = variant
+        kwargs["source"] = "*"
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        name = recipe.image_variants.get(self.variant, recipe.image.name)
+        return build_url(self, name, recipe.image.storage)
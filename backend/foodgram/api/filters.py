@@ -1,23 +1,65 @@
+from django.db.models import Exists, OuterRef
+from recipes.models import Favorite, ShoppingCart, TagRecipe
+from recipes.popularity import ORDERINGS
+from recipes.search import search_recipes
 from rest_framework import filters
 
 
 class RecipeFilterBackend(filters.BaseFilterBackend):
     """
-    Filter that only allows users to see their own objects.
+    Filter recipes by author, tags, favorites and shopping cart, search
+    their names and descriptions and order them by popularity.
+
+    Relations are checked with EXISTS subqueries, so a recipe is never
+    duplicated by the join and no DISTINCT is needed. Search results are
+    ordered by relevance unless the cursor pagination or a popularity
+    ordering orders them.
     """
 
     def filter_queryset(self, request, queryset, view):
-        filter_params = {}
         author = request.query_params.get("author")
         if author is not None and author.isdigit():
-            filter_params["author"] = author
+            queryset = queryset.filter(author=author)
         is_favorited = request.query_params.get("is_favorited")
-        if is_favorited == "1":
-            filter_params["favorite__user"] = request.user
         is_in_shopping_cart = request.query_params.get("is_in_shopping_cart")
+        if request.user.is_anonymous and "1" in (
+            is_favorited,
+            is_in_shopping_cart,
+        ):
+            return queryset.none()
+        if is_favorited == "1":
+            queryset = queryset.filter(
+                Exists(
+                    Favorite.objects.filter(
+                        user=request.user, recipe=OuterRef("pk")
+                    )
+                )
+            )
         if is_in_shopping_cart == "1":
-            filter_params["shopping_cart__user"] = request.user
+            queryset = queryset.filter(
+                Exists(
+                    ShoppingCart.objects.filter(
+                        user=request.user, recipe=OuterRef("pk")
+                    )
+                )
+            )
         tags = request.query_params.getlist("tags")
         if len(tags) > 0:
-            filter_params["tags__tag__slug__in"] = tags
-        return queryset.filter(**filter_params).distinct()
+            queryset = queryset.filter(
+                Exists(
+                    TagRecipe.objects.filter(
+                        recipe=OuterRef("pk"), tag__slug__in=tags
+                    )
+                )
+            )
+        search = request.query_params.get("search", "").strip()
+        if search:
+            queryset = search_recipes(queryset, search)
+        score = ORDERINGS.get(request.query_params.get("ordering"))
+        if score is None:
+            return queryset
+        # The inner join and the score table's own tie-breaker let the
+        # score index drive the ordering without a sort.
+        return queryset.filter(score__isnull=False).order_by(
+            f"-score__{score}", "-score__recipe_id"
+        )
@@ -0,0 +1,58 @@
+import time
+from bisect import bisect_left
+from threading import Lock
+
+from django.conf import settings
+from recipes.models import Ingredient
+
+
+class IngredientIndex:
+    """
+    Sorted in-memory copy of the ingredient catalog for prefix search.
+
+    Every worker loads the catalog on first use and reloads it after an
+    Ingredient change in the same process or once the ttl has passed,
+    which covers changes made by other workers.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._keys = []
+        self._rows = []
+        self._loaded_at = None
+        self._lock = Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def load(self):
+        with self._lock:
+            if (
+                self._loaded_at is None
+                or time.monotonic() - self._loaded_at > self.ttl
+            ):
+                rows = sorted(
+                    Ingredient.objects.values(
+                        "id", "name", "measurement_unit"
+                    ),
+                    key=lambda row: (row["name"].casefold(), row["id"]),
+                )
+                self._keys = [row["name"].casefold() for row in rows]
+                self._rows = rows
+                self._loaded_at = time.monotonic()
+            return self._keys, self._rows
+
+    def search(self, prefix, limit=None):
+        keys, rows = self.load()
+        if not prefix:
+            return rows[:limit]
+        prefix = prefix.casefold()
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + "\U0010ffff", start)
+        if limit is not None:
+            end = min(end, start + limit)
+        return rows[start:end]
+
+
+ingredient_index = IngredientIndex(settings.INGREDIENT_INDEX_TTL)
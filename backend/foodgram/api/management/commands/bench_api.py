@@ -0,0 +1,296 @@
+import json
+import statistics
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from recipes.models import Ingredient, Recipe, Tag
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.models import User
+
+
+def percentiles(timings):
+    if len(timings) < 2:
+        return timings * 3
+    cuts = statistics.quantiles(timings, n=100, method="inclusive")
+    return cuts[49], cuts[94], cuts[98]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the API endpoints in-process on a seeded database and "
+        "report p50/p95/p99 latency, queries per request and peak memory "
+        "as JSON, optionally compared with a saved baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=50)
+        parser.add_argument("--warmup", type=int, default=3)
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=1,
+            help="Threads sending the requests of an endpoint, toggles "
+            "always run in one.",
+        )
+        parser.add_argument("--email", help="User to authenticate as.")
+        parser.add_argument(
+            "--only", nargs="+", help="Names of the endpoints to run."
+        )
+        parser.add_argument("--output", help="Write the results here.")
+        parser.add_argument("--baseline", help="Results to compare with.")
+        parser.add_argument(
+            "--max-regression",
+            type=float,
+            help="Fail when p95 grows by more than this many percent or "
+            "an endpoint issues more queries than in the baseline.",
+        )
+
+    def get_user(self, email):
+        if email:
+            return User.objects.get(email=email)
+        user = (
+            User.objects.annotate(
+                favorites=Count("favorite", distinct=True),
+                cart=Count("shopping_cart", distinct=True),
+            )
+            .order_by("-favorites", "-cart")
+            .first()
+        )
+        if user is None:
+            raise CommandError("The database has no users, seed it first")
+        return user
+
+    def get_endpoints(self, user):
+        recipe = Recipe.objects.order_by("-favorites_count").first()
+        if recipe is None:
+            raise CommandError("The database has no recipes, seed it first")
+        spare = (
+            Recipe.objects.exclude(favorite__user=user)
+            .exclude(shopping_cart__user=user)
+            .order_by("-favorites_count")
+            .first()
+        )
+        tags = list(Tag.objects.values_list("slug", flat=True)[:2])
+        author = (
+            User.objects.exclude(pk=user.pk)
+            .order_by("-recipes_count")
+            .first()
+        )
+        ingredient = Ingredient.objects.order_by("name").first()
+        prefix = ingredient.name[:2] if ingredient else "a"
+        endpoints = {
+            "recipes list": ("get", "/api/recipes/", {}),
+            "recipes list author": (
+                "get",
+                "/api/recipes/",
+                {"author": recipe.author_id},
+            ),
+            "recipes list is_favorited": (
+                "get",
+                "/api/recipes/",
+                {"is_favorited": 1},
+            ),
+            "recipes list is_in_shopping_cart": (
+                "get",
+                "/api/recipes/",
+                {"is_in_shopping_cart": 1},
+            ),
+            "recipes list tags": ("get", "/api/recipes/", {"tags": tags}),
+            "recipes list popular_24h": (
+                "get",
+                "/api/recipes/",
+                {"ordering": "popular_24h"},
+            ),
+            "recipes list all filters": (
+                "get",
+                "/api/recipes/",
+                {
+                    "author": recipe.author_id,
+                    "is_favorited": 1,
+                    "is_in_shopping_cart": 1,
+                    "tags": tags,
+                },
+            ),
+            "recipe detail": ("get", f"/api/recipes/{recipe.pk}/", {}),
+            "subscriptions": (
+                "get",
+                "/api/users/subscriptions/",
+                {"recipes_limit": 3},
+            ),
+            "ingredients search": (
+                "get",
+                "/api/ingredients/",
+                {"name": prefix},
+            ),
+            "download_shopping_cart pdf": (
+                "get",
+                "/api/recipes/download_shopping_cart/",
+                {},
+            ),
+            "download_shopping_cart txt": (
+                "get",
+                "/api/recipes/download_shopping_cart/",
+                {"format": "txt"},
+            ),
+        }
+        if spare is not None:
+            for name, path in (
+                ("favorite", f"/api/recipes/{spare.pk}/favorite/"),
+                ("shopping_cart", f"/api/recipes/{spare.pk}/shopping_cart/"),
+            ):
+                endpoints[f"{name} toggle"] = ("toggle", path, {})
+        if author is not None:
+            endpoints["subscribe toggle"] = (
+                "toggle",
+                f"/api/users/{author.pk}/subscribe/",
+                {},
+            )
+        return endpoints
+
+    def send(self, client, method, path, params):
+        """
+        Send one request, a toggle adds and removes again.
+        """
+        if method == "toggle":
+            response = client.post(path)
+            client.delete(path)
+        else:
+            response = getattr(client, method)(path, params)
+        if hasattr(response, "streaming_content"):
+            b"".join(response.streaming_content)
+        return response
+
+    def worker(self, key, endpoint, count):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {key}")
+        timings = []
+        queries = []
+        statuses = set()
+        try:
+            for _ in range(count):
+                with CaptureQueriesContext(connection) as captured:
+                    start = time.perf_counter()
+                    response = self.send(client, *endpoint)
+                    timings.append(time.perf_counter() - start)
+                queries.append(len(captured))
+                statuses.add(response.status_code)
+        finally:
+            connection.close()
+        return timings, queries, statuses
+
+    def run(self, key, endpoint, options):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {key}")
+        for _ in range(options["warmup"]):
+            self.send(client, *endpoint)
+        concurrency = max(1, options["concurrency"])
+        if endpoint[0] == "toggle":
+            # Threads toggling the same user and recipe race on
+            # get_or_create and would time their 400s.
+            concurrency = 1
+        shares = [options["requests"] // concurrency] * concurrency
+        shares[0] += options["requests"] % concurrency
+        timings, queries, statuses = [], [], set()
+        start = time.perf_counter()
+        if concurrency == 1:
+            results = [self.worker(key, endpoint, shares[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                results = list(
+                    pool.map(
+                        lambda share: self.worker(key, endpoint, share),
+                        shares,
+                    )
+                )
+        elapsed = time.perf_counter() - start
+        for result in results:
+            timings += result[0]
+            queries += result[1]
+            statuses |= result[2]
+
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        self.send(client, *endpoint)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        p50, p95, p99 = percentiles(timings)
+        return {
+            "requests": len(timings),
+            "p50_ms": round(p50 * 1000, 3),
+            "p95_ms": round(p95 * 1000, 3),
+            "p99_ms": round(p99 * 1000, 3),
+            "throughput_rps": round(len(timings) / elapsed, 1),
+            "concurrency": concurrency,
+            "queries": max(queries),
+            "peak_kib": round(peak / 1024, 1),
+            "status": sorted(statuses),
+        }
+
+    def compare(self, results, baseline, max_regression):
+        regressions = []
+        for name, result in results.items():
+            before = baseline.get(name)
+            if before is None:
+                continue
+            change = (result["p95_ms"] / before["p95_ms"] - 1) * 100
+            self.stdout.write(
+                f"{name}: p95 {before['p95_ms']} -> {result['p95_ms']} ms "
+                f"({change:+.1f}%), queries {before['queries']} -> "
+                f"{result['queries']}"
+            )
+            if max_regression is not None and (
+                change > max_regression
+                or result["queries"] > before["queries"]
+            ):
+                regressions.append(name)
+        return regressions
+
+    def handle(self, *args, **options):
+        user = self.get_user(options["email"])
+        key = Token.objects.get_or_create(user=user)[0].key
+        endpoints = self.get_endpoints(user)
+        if options["only"]:
+            endpoints = {
+                name: endpoints[name]
+                for name in options["only"]
+                if name in endpoints
+            }
+        results = {}
+        for name, endpoint in endpoints.items():
+            results[name] = result = self.run(key, endpoint, options)
+            self.stdout.write(
+                f"{name}: p50 {result['p50_ms']:.2f} ms, "
+                f"p95 {result['p95_ms']:.2f} ms, "
+                f"p99 {result['p99_ms']:.2f} ms, "
+                f"{result['queries']} queries, "
+                f"peak {result['peak_kib']:.0f} KiB, "
+                f"status {result['status']}"
+            )
+        report = {
+            "database": connection.vendor,
+            "recipes": Recipe.objects.count(),
+            "user": user.email,
+            "requests": options["requests"],
+            "concurrency": options["concurrency"],
+            "endpoints": results,
+        }
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+        if options["baseline"]:
+            with open(options["baseline"], encoding="utf-8") as f:
+                baseline = json.load(f)["endpoints"]
+            regressions = self.compare(
+                results, baseline, options["max_regression"]
+            )
+            if regressions:
+                raise CommandError(
+                    f"Regressions in: {', '.join(regressions)}"
+                )
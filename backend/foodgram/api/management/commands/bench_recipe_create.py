@@ -0,0 +1,92 @@
+import base64
+import io
+import statistics
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from recipes.models import Ingredient, Recipe, Tag
+from rest_framework.test import APIClient
+from users.models import User
+
+
+def make_image():
+    buffer = io.BytesIO()
+    Image.new("RGB", (1, 1)).save(buffer, "PNG")
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f"data:image/png;base64,{encoded}"
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure POST /api/recipes/ latency and queries by ingredient "
+        "count. Everything is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", type=int, nargs="+", default=[1, 10, 50, 100]
+        )
+        parser.add_argument("--repeat", type=int, default=10)
+
+    def handle(self, *args, **options):
+        image = make_image()
+        images = []
+        with transaction.atomic():
+            user = User.objects.create_user(
+                username="bench_recipe_create",
+                email="bench_recipe_create@example.com",
+                password="bench",
+            )
+            tag = Tag.objects.create(
+                name="bench_recipe_create",
+                color="#010203",
+                slug="bench_recipe_create",
+            )
+            Ingredient.objects.bulk_create(
+                Ingredient(name=f"bench {i}", measurement_unit="г")
+                for i in range(max(options["sizes"]))
+            )
+            ingredients = list(
+                Ingredient.objects.filter(name__startswith="bench ")
+            )
+            client = APIClient()
+            client.force_authenticate(user)
+            for size in options["sizes"]:
+                payload = {
+                    "ingredients": [
+                        {"id": ingredient.pk, "amount": 1}
+                        for ingredient in ingredients[:size]
+                    ],
+                    "tags": [tag.pk],
+                    "image": image,
+                    "name": "bench",
+                    "text": "bench",
+                    "cooking_time": 1,
+                }
+                timings = []
+                for _ in range(options["repeat"]):
+                    with CaptureQueriesContext(connection) as queries:
+                        start = time.perf_counter()
+                        response = client.post(
+                            "/api/recipes/", payload, format="json"
+                        )
+                        timings.append(time.perf_counter() - start)
+                    assert response.status_code == 201, response.content
+                self.stdout.write(
+                    f"{size} ingredients: "
+                    f"median {statistics.median(timings) * 1000:.2f} ms, "
+                    f"{len(queries.captured_queries)} queries"
+                )
+            images = list(
+                Recipe.objects.filter(author=user).values_list(
+                    "image", flat=True
+                )
+            )
+            transaction.set_rollback(True)
+        for name in set(images):
+            if not Recipe.objects.filter(image=name).exists():
+                default_storage.delete(name)
@@ -0,0 +1,63 @@
+import statistics
+import time
+
+from api.shopping_list import STREAMS, clear_font_cache, render_pdf
+from django.core.management.base import BaseCommand
+
+
+def render_stream(fmt, ingredients):
+    return b"".join(
+        chunk.encode("utf-8") for chunk in STREAMS[fmt](ingredients)
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure cold and warm shopping list PDF render latency and the "
+        "latency and size of every export format."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lines", type=int, default=50)
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def measure(self, render, ingredients, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            content = render(ingredients)
+            timings.append(time.perf_counter() - start)
+        return timings, content
+
+    def report(self, label, timings, content):
+        self.stdout.write(
+            f"{label}: median {statistics.median(timings) * 1000:.2f} ms, "
+            f"min {min(timings) * 1000:.2f} ms, {len(content)} bytes"
+        )
+
+    def handle(self, *args, **options):
+        ingredients = [
+            {
+                "ingredient__name": f"ингредиент {i}",
+                "ingredient__measurement_unit": "г",
+                "total_amount": float(i),
+            }
+            for i in range(options["lines"])
+        ]
+        self.stdout.write(f"lines: {options['lines']}")
+
+        clear_font_cache()
+        timings, content = self.measure(render_pdf, ingredients, 1)
+        self.report("pdf cold", timings, content)
+        timings, content = self.measure(
+            render_pdf, ingredients, options["repeat"]
+        )
+        self.report("pdf warm", timings, content)
+
+        for fmt in STREAMS:
+            timings, content = self.measure(
+                lambda rows: render_stream(fmt, rows),
+                ingredients,
+                options["repeat"],
+            )
+            self.report(fmt, timings, content)
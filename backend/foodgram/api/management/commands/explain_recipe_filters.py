@@ -0,0 +1,98 @@
+import re
+
+from api.filters import RecipeFilterBackend
+from api.views import RecipeViewSet
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from recipes.models import Recipe, Tag
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from users.models import User
+
+
+def sequential_scans(plan):
+    lines = plan.splitlines()
+    if connection.vendor == "postgresql":
+        return [line for line in lines if "Seq Scan" in line]
+    if connection.vendor == "sqlite":
+        return [
+            line
+            for line in lines
+            if re.search(r"\bSCAN\b", line)
+            and "USING" not in line
+            and "VIRTUAL TABLE" not in line
+        ]
+    return []
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN the recipe feed query for every RecipeFilterBackend "
+        "filter and fail on sequential scans. Run it on a seeded database, "
+        "on a handful of rows the planner prefers scans anyway."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--email", help="User for the user filters.")
+        parser.add_argument("--limit", type=int, default=10)
+        parser.add_argument("--verbose", action="store_true")
+
+    def get_cases(self, user):
+        tags = list(Tag.objects.values_list("slug", flat=True)[:2])
+        name = Recipe.objects.values_list("name", flat=True).first() or ""
+        word = name.split()[0] if name.split() else "a"
+        return [
+            ("feed", {}),
+            ("author", {"author": user.pk}),
+            ("is_favorited", {"is_favorited": 1}),
+            ("is_in_shopping_cart", {"is_in_shopping_cart": 1}),
+            ("tags", {"tags": tags}),
+            ("search", {"search": word}),
+            ("popular", {"ordering": "popular"}),
+            ("popular_24h tags", {"ordering": "popular_24h", "tags": tags}),
+            (
+                "all filters",
+                {
+                    "author": user.pk,
+                    "is_favorited": 1,
+                    "is_in_shopping_cart": 1,
+                    "tags": tags,
+                },
+            ),
+        ]
+
+    def get_queryset(self, user, params):
+        request = Request(APIRequestFactory().get("/api/recipes/", params))
+        request.user = user
+        view = RecipeViewSet(request=request, format_kwarg=None)
+        queryset = view.get_queryset()
+        return RecipeFilterBackend().filter_queryset(request, queryset, view)
+
+    def handle(self, *args, **options):
+        if options["email"]:
+            user = User.objects.get(email=options["email"])
+        else:
+            user = (
+                User.objects.annotate(favorites=Count("favorite"))
+                .order_by("-favorites")
+                .first()
+            )
+        if user is None:
+            raise CommandError("The database has no users, seed it first")
+        failed = []
+        for name, params in self.get_cases(user):
+            queryset = self.get_queryset(user, params)
+            for label, plan in (
+                ("page", queryset[: options["limit"]].explain()),
+                ("count", queryset.order_by().values("pk").explain()),
+            ):
+                scans = sequential_scans(plan)
+                status = "SEQ SCAN" if scans else "ok"
+                self.stdout.write(f"{name} ({label}): {status}")
+                if options["verbose"] or scans:
+                    self.stdout.write(plan)
+                if scans:
+                    failed.append(f"{name} ({label})")
+        if failed:
+            raise CommandError(f"Sequential scans in: {', '.join(failed)}")
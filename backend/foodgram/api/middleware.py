@@ -0,0 +1,90 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .query_budgets import QUERY_BUDGETS
+
+logger = logging.getLogger(__name__)
+
+
+class QueryRecorder:
+    """
+    Database execute wrapper counting and timing the statements it runs.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.slowest = (0.0, None)
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.duration += duration
+            if duration > self.slowest[0]:
+                self.slowest = (duration, sql)
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Report the queries of every request in a Server-Timing header and a
+    log record, and warn when a view exceeds its query budget.
+
+    Enabled by the SQL_INSTRUMENTATION setting. Queries run while a
+    streaming response is consumed are not counted.
+    """
+
+    def __init__(self, get_response):
+        if not settings.SQL_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+        slowest, slowest_sql = recorder.slowest
+        response["Server-Timing"] = ", ".join(
+            (
+                f"db;dur={recorder.duration * 1000:.2f};"
+                f'desc="{recorder.count} queries"',
+                f"db-slowest;dur={slowest * 1000:.2f}",
+                f"total;dur={total * 1000:.2f}",
+            )
+        )
+        match = request.resolver_match
+        view_name = match.view_name if match is not None else None
+        record = {
+            "method": request.method,
+            "path": request.path,
+            "view": view_name,
+            "status": response.status_code,
+            "queries": recorder.count,
+            "sql_ms": round(recorder.duration * 1000, 2),
+            "slowest_ms": round(slowest * 1000, 2),
+            "slowest_sql": slowest_sql,
+            "total_ms": round(total * 1000, 2),
+        }
+        logger.info("sql %(method)s %(path)s", record, extra=record)
+        budget = QUERY_BUDGETS.get((request.method, view_name))
+        if budget is not None and recorder.count > budget:
+            logger.warning(
+                "%s issued %d queries, its budget is %d",
+                view_name,
+                recorder.count,
+                budget,
+                extra=record,
+            )
+        return response
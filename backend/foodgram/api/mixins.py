@@ -0,0 +1,24 @@
+from django.utils.cache import get_conditional_response, patch_cache_control
+from rest_framework.response import Response
+
+
+class CachedCatalogMixin:
+    """
+    Serve the unpaginated, unfiltered list of a small read-mostly catalog
+    from ``catalog_cache`` and answer revalidations with 304.
+    """
+
+    catalog_cache = None
+
+    def build_catalog(self):
+        serializer = self.get_serializer(self.get_queryset(), many=True)
+        return serializer.data
+
+    def list(self, request, *args, **kwargs):
+        etag, data = self.catalog_cache.get(self.build_catalog)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = Response(data)
+        response["ETag"] = etag
+        patch_cache_control(response, public=True, no_cache=True)
+        return response
@@ -1,7 +1,198 @@
+import base64
+import json
+from collections import OrderedDict
+
 from django.conf import settings
-from rest_framework.pagination import PageNumberPagination
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import connection
+from django.db.models import Q
+from recipes.models import Recipe
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Pagination that continues after the last row of the previous page
+    instead of counting and skipping rows, so every page costs the same.
+
+    The view declares a unique ordering in ``cursor_ordering``.
+    """
+
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = settings.PAGE_SIZE_QUERY_PARAM
+    max_page_size = settings.MAX_PAGE_SIZE
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = view.cursor_ordering
+        self.page_size = self.get_page_size(request)
+        self.fields = [
+            queryset.model._meta.get_field(field.lstrip("-"))
+            for field in self.ordering
+        ]
+        queryset = queryset.order_by(*self.ordering)
+        self.count = None
+        if request.query_params.get(self.count_query_param) == "approximate":
+            self.count = self.get_approximate_count(queryset)
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self.get_after_position(position))
+        results = list(queryset[: self.page_size + 1])
+        self.next_position = None
+        if len(results) > self.page_size:
+            results = results[: self.page_size]
+            self.next_position = [
+                field.value_to_string(results[-1]) for field in self.fields
+            ]
+        return results
+
+    def get_page_size(self, request):
+        page_size = request.query_params.get(self.page_size_query_param)
+        if page_size is not None and page_size.isdigit() and int(page_size):
+            return min(int(page_size), self.max_page_size)
+        return self.page_size
+
+    def get_after_position(self, position, names=None):
+        """
+        Rows after ``position`` in the ordering, ``names`` replaces the
+        ordering field names for querysets of another model.
+        """
+        if names is None:
+            names = [field.name for field in self.fields]
+        condition = Q()
+        equal = Q()
+        keys = zip(self.ordering, names, position)
+        for ordering, name, value in keys:
+            lookup = "lt" if ordering.startswith("-") else "gt"
+            condition |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def get_approximate_count(self, queryset):
+        """
+        Row estimate of the planner on Postgres, exact count elsewhere.
+        """
+        if connection.vendor != "postgresql":
+            return queryset.count()
+        plan = json.loads(queryset.explain(format="json"))
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    def encode_cursor(self, position):
+        data = json.dumps(position)
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            position = [
+                field.to_python(value)
+                for field, value in zip(self.fields, values)
+            ]
+        except (TypeError, ValueError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        if len(position) != len(self.fields):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.next_position),
+        )
+
+    def get_paginated_response(self, data):
+        response = OrderedDict()
+        if self.count is not None:
+            response["count"] = self.count
+        response["next"] = self.get_next_link()
+        response["results"] = data
+        return Response(response)
+
+
+class FeedPagination(KeysetPagination):
+    """
+    Keyset pages merged from several sources of ``(pub_date, recipe id)``
+    rows, newest first, returning the recipe ids of the page.
+
+    Every source is a queryset with the names of its pub_date and recipe
+    id fields, each one is read up to a page past the cursor.
+    """
+
+    ordering = ("-pub_date", "-id")
+
+    def paginate_sources(self, sources, request):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.fields = [
+            Recipe._meta.get_field(field.lstrip("-"))
+            for field in self.ordering
+        ]
+        self.count = None
+        position = self.decode_cursor(request)
+        rows = set()
+        for queryset, names in sources:
+            if position is not None:
+                queryset = queryset.filter(
+                    self.get_after_position(position, names)
+                )
+            ordering = [f"-{name}" for name in names]
+            rows.update(
+                queryset.order_by(*ordering).values_list(*names)[
+                    : self.page_size + 1
+                ]
+            )
+        rows = sorted(rows, reverse=True)[: self.page_size + 1]
+        self.next_position = None
+        if len(rows) > self.page_size:
+            rows = rows[: self.page_size]
+            pub_date, pk = rows[-1]
+            last = Recipe(pk=pk, pub_date=pub_date)
+            self.next_position = [
+                field.value_to_string(last) for field in self.fields
+            ]
+        return [pk for _, pk in rows]
 
 
 class StandardResultsSetPagination(PageNumberPagination):
+    """
+    Page numbers by default, keyset pages once the client sends ``cursor``
+    to a view that declares ``cursor_ordering``.
+    """
+
     page_size_query_param = settings.PAGE_SIZE_QUERY_PARAM
     max_page_size = settings.MAX_PAGE_SIZE
+    keyset = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if KeysetPagination.cursor_query_param in request.query_params and (
+            getattr(view, "cursor_ordering", None)
+        ):
+            self.keyset = KeysetPagination()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_page_state(self):
+        """
+        What the paginated response depends on besides the page's rows.
+        """
+        if self.keyset is not None:
+            return self.keyset.count, self.keyset.next_position
+        return self.page.paginator.count, self.page.number
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
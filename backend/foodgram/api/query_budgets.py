@@ -0,0 +1,29 @@
+"""
+Most queries a view may issue per request, keyed by HTTP method and URL
+name. The token lookup is included, as on a cold token cache.
+"""
+
+QUERY_BUDGETS = {
+    ("GET", "recipes-list"): 7,
+    ("POST", "recipes-list"): 18,
+    ("GET", "recipes-detail"): 7,
+    ("PUT", "recipes-detail"): 20,
+    ("PATCH", "recipes-detail"): 20,
+    ("DELETE", "recipes-detail"): 20,
+    ("GET", "recipes-download-shopping-cart"): 3,
+    ("GET", "recipes-feed"): 8,
+    ("POST", "favorite"): 8,
+    ("DELETE", "favorite"): 8,
+    ("POST", "shopping_cart"): 7,
+    ("DELETE", "shopping_cart"): 7,
+    ("GET", "users-list"): 4,
+    ("GET", "users-detail"): 3,
+    ("GET", "users-me"): 2,
+    ("GET", "users-subscriptions"): 4,
+    ("POST", "users-subscribe"): 12,
+    ("DELETE", "users-subscribe"): 8,
+    ("GET", "tags-list"): 2,
+    ("GET", "tags-detail"): 2,
+    ("GET", "ingredients-list"): 2,
+    ("GET", "ingredients-detail"): 2,
+}
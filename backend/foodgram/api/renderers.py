@@ -0,0 +1,40 @@
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class FileRenderer(BaseRenderer):
+    """
+    Only picks the file format during content negotiation, the view builds
+    the file response itself and renders its errors with JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+
+class PDFRenderer(FileRenderer):
+    media_type = "application/pdf"
+    format = "pdf"
+    charset = None
+    render_style = "binary"
+
+
+class PlainTextRenderer(FileRenderer):
+    media_type = "text/plain"
+    format = "txt"
+
+
+class CSVRenderer(FileRenderer):
+    media_type = "text/csv"
+    format = "csv"
+
+
+SHOPPING_LIST_RENDERERS = [
+    PDFRenderer,
+    PlainTextRenderer,
+    CSVRenderer,
+    JSONRenderer,
+]
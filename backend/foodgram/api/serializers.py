@@ -1,10 +1,11 @@
-from django.contrib.auth.models import AnonymousUser
-from drf_extra_fields.fields import Base64ImageField
-from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
-                            ShoppingCart, Tag)
+from collections import Counter
+
+from recipes.models import Ingredient, IngredientRecipe, Recipe, Tag
 from rest_framework import serializers
 from users.models import Follower, User
 
+from .fields import ContentHashImageField, ImageVariantsField, ThumbnailField
+
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -44,16 +45,29 @@ class UserGetSerializer(UserSerializer):
         )
         model = User
 
+    def get_subscriptions(self):
+        """
+        Ids of the authors the current user follows, loaded once and shared
+        through the context by every nested and listed user.
+        """
+        if "subscriptions" not in self.context:
+            user = self.context["request"].user
+            if user.is_anonymous:
+                subscriptions = set()
+            else:
+                subscriptions = set(
+                    Follower.objects.filter(follower=user).values_list(
+                        "author_id", flat=True
+                    )
+                )
+            self.context["subscriptions"] = subscriptions
+        return self.context["subscriptions"]
+
     def get_is_subscribed(self, instance):
-        user = self.context["request"].user
-        author = instance
-        if (
-            not isinstance(user, AnonymousUser)
-            and Follower.objects.filter(author=author, follower=user).exists()
-        ):
-            return True
-        else:
-            return False
+        is_subscribed = getattr(instance, "is_subscribed", None)
+        if is_subscribed is not None:
+            return is_subscribed
+        return instance.pk in self.get_subscriptions()
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -77,7 +91,8 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 
 class RecipeSerializer(serializers.ModelSerializer):
-    image = Base64ImageField()
+    image = ContentHashImageField()
+    image_variants = ImageVariantsField()
     tags = serializers.PrimaryKeyRelatedField(
         queryset=Tag.objects.all(), many=True
     )
@@ -97,6 +112,7 @@ class RecipeSerializer(serializers.ModelSerializer):
             "is_in_shopping_cart",
             "name",
             "image",
+            "image_variants",
             "text",
             "cooking_time",
         )
@@ -128,38 +144,50 @@ class RecipeSerializer(serializers.ModelSerializer):
             data["ingredients"].append(ingredient_dict)
         return data
 
+    def validate_ingredients(self, value):
+        """
+        Resolve all ingredient ids with one query and report unknown and
+        repeated ids together.
+        """
+        ids = [str(ingredient["ingredient"]) for ingredient in value]
+        numeric_ids = {int(pk) for pk in ids if pk.isdigit()}
+        found = Ingredient.objects.in_bulk(numeric_ids)
+        missing = sorted(
+            {pk for pk in ids if not pk.isdigit() or int(pk) not in found}
+        )
+        repeated = sorted(
+            pk for pk, count in Counter(ids).items() if count > 1
+        )
+        errors = []
+        if missing:
+            errors.append(f"Ингредиенты не найдены: {', '.join(missing)}")
+        if repeated:
+            errors.append(f"Ингредиенты повторяются: {', '.join(repeated)}")
+        if errors:
+            raise serializers.ValidationError(errors)
+        for ingredient in value:
+            ingredient["ingredient"] = found[int(ingredient["ingredient"])]
+        return value
+
     def get_is_favorited(self, instance):
-        user = self.context["request"].user
-        if (
-            not isinstance(user, AnonymousUser)
-            and Favorite.objects.filter(user=user, recipe=instance).exists()
-        ):
-            return True
-        else:
-            return False
+        return getattr(instance, "is_favorited", False)
 
     def get_is_in_shopping_cart(self, instance):
-        user = self.context["request"].user
-        if (
-            not isinstance(user, AnonymousUser)
-            and ShoppingCart.objects.filter(
-                user=user, recipe=instance
-            ).exists()
-        ):
-            return True
-        else:
-            return False
+        return getattr(instance, "is_in_shopping_cart", False)
 
 
 class RecipeShortSerializer(serializers.ModelSerializer):
+    image = ThumbnailField()
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Recipe
-        fields = ("id", "name", "image", "cooking_time")
+        fields = ("id", "name", "image", "image_variants", "cooking_time")
         read_only_fields = ("id", "name", "image", "cooking_time")
 
 
 class FollowerSerializer(UserGetSerializer):
-    recipes_count = serializers.SerializerMethodField(required=False)
+    recipes_count = serializers.IntegerField(read_only=True)
     recipes = RecipeShortSerializer(many=True, read_only=True)
 
     class Meta:
@@ -174,15 +202,3 @@ class FollowerSerializer(UserGetSerializer):
             "recipes_count",
         )
         model = User
-
-    def get_recipes_count(self, instance):
-        return Recipe.objects.filter(author=instance).count()
-
-    def to_representation(self, instance):
-        data = super(FollowerSerializer, self).to_representation(instance)
-        recipes_limit = self.context["request"].query_params.get(
-            "recipes_limit"
-        )
-        if recipes_limit is not None:
-            data["recipes"] = data["recipes"][: int(recipes_limit)]
-        return data
@@ -0,0 +1,174 @@
+import csv
+import json
+import os
+from threading import Lock
+
+from django.conf import settings
+from django.db.models import Sum
+from django.utils.http import quote_etag
+from fpdf import FPDF
+from recipes.models import IngredientRecipe
+
+from .cache import LRUCache
+
+FONT_FAMILY = "DejaVu"
+FONT_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "fonts",
+    "DejaVuSerifCondensed.ttf",
+)
+
+_font_cache = {}
+_font_lock = Lock()
+
+shopping_list_cache = LRUCache(settings.SHOPPING_LIST_CACHE_SIZE)
+
+
+def get_shopping_list(user):
+    """
+    Ingredients from the user's shopping cart, summed by name and unit.
+    """
+    return (
+        IngredientRecipe.objects.filter(recipe__shopping_cart__user=user)
+        .values("ingredient__name", "ingredient__measurement_unit")
+        .annotate(total_amount=Sum("amount"))
+        .order_by("ingredient__name", "ingredient__measurement_unit")
+    )
+
+
+def shopping_list_etag(user, fmt):
+    """
+    The cart version changes with every change of the user's shopping list.
+    """
+    return quote_etag(f"{user.pk}-{user.shopping_cart_version}-{fmt}")
+
+
+def get_cached_pdf(user):
+    """
+    Return the rendered shopping list and whether it came from the cache.
+    """
+    key = (user.pk, user.shopping_cart_version)
+    content = shopping_list_cache.get(key)
+    if content is not None:
+        return content, True
+    content = render_pdf(get_shopping_list(user))
+    shopping_list_cache.set(key, content)
+    return content, False
+
+
+class Echo:
+    """
+    File-like object that hands the written row back to the csv writer.
+    """
+
+    def write(self, value):
+        return value
+
+
+def stream_txt(ingredients):
+    yield "Ваш список покупок:\n"
+    for ingredient in ingredients:
+        name = ingredient["ingredient__name"]
+        unit = ingredient["ingredient__measurement_unit"]
+        amount = ingredient["total_amount"]
+        yield f"{name} ({unit}) - {amount}\n"
+
+
+def stream_csv(ingredients):
+    writer = csv.writer(Echo())
+    yield writer.writerow(("name", "measurement_unit", "amount"))
+    for ingredient in ingredients:
+        yield writer.writerow(
+            (
+                ingredient["ingredient__name"],
+                ingredient["ingredient__measurement_unit"],
+                ingredient["total_amount"],
+            )
+        )
+
+
+def stream_json(ingredients):
+    separator = ""
+    yield "["
+    for ingredient in ingredients:
+        item = {
+            "name": ingredient["ingredient__name"],
+            "measurement_unit": ingredient["ingredient__measurement_unit"],
+            "amount": ingredient["total_amount"],
+        }
+        yield separator + json.dumps(item, ensure_ascii=False)
+        separator = ","
+    yield "]"
+
+
+STREAMS = {
+    "txt": stream_txt,
+    "csv": stream_csv,
+    "json": stream_json,
+}
+
+
+def stream_shopping_list(user, fmt):
+    """
+    Encode the shopping list row by row while it is read from the cursor.
+    """
+    ingredients = get_shopping_list(user).iterator()
+    for chunk in STREAMS[fmt](ingredients):
+        yield chunk.encode("utf-8")
+
+
+def load_font():
+    """
+    Parse the TTF metrics once per process and keep them for every
+    following document.
+    """
+    with _font_lock:
+        if not _font_cache:
+            pdf = FPDF()
+            pdf.add_font(FONT_FAMILY, "", FONT_PATH, uni=True)
+            _font_cache["fonts"] = pdf.fonts
+            _font_cache["font_files"] = pdf.font_files
+    return _font_cache
+
+
+def clear_font_cache():
+    with _font_lock:
+        _font_cache.clear()
+
+
+class ShoppingListPDF(FPDF):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        font_cache = load_font()
+        # Per-document copies: FPDF records the used glyphs in "subset"
+        # and object numbers in "n" while writing the output.
+        for key, font in font_cache["fonts"].items():
+            self.fonts[key] = dict(font, subset=list(font["subset"]))
+        for key, font_file in font_cache["font_files"].items():
+            self.font_files[key] = dict(font_file)
+
+
+def render_pdf(ingredients):
+    pdf = ShoppingListPDF()
+    pdf.add_page()
+    pdf.set_font(FONT_FAMILY, "", 16)
+    pdf.cell(200, 10, txt="Ваш список покупок:", ln=1, align="C")
+    ingredients = list(ingredients)
+    if ingredients:
+        pdf.set_font(FONT_FAMILY, "", 14)
+        for ingredient in ingredients:
+            name = ingredient["ingredient__name"]
+            unit = ingredient["ingredient__measurement_unit"]
+            amount = ingredient["total_amount"]
+            pdf.cell(
+                0, 10, txt=f"{name} ({unit}) - {amount}", ln=1, align="L"
+            )
+    else:
+        pdf.cell(
+            0,
+            10,
+            txt="Вы ещё не добавили рецепты в список покупок :(",
+            ln=1,
+            align="L",
+        )
+    return pdf.output(dest="S").encode("latin1")
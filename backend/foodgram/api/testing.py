@@ -0,0 +1,76 @@
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+from .query_budgets import QUERY_BUDGETS
+
+SAVEPOINT = re.compile(r"(RELEASE |ROLLBACK TO )?SAVEPOINT ", re.IGNORECASE)
+
+
+class _AssertMaxQueriesContext(CaptureQueriesContext):
+    """
+    Savepoints are not counted, inside the test case's transaction every
+    atomic block of the view adds two where a request adds a BEGIN at most.
+    """
+
+    def __init__(self, test_case, num, connection):
+        self.test_case = test_case
+        self.num = num
+        super().__init__(connection)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        super().__exit__(exc_type, exc_value, traceback)
+        if exc_type is not None:
+            return
+        queries = [
+            query["sql"]
+            for query in self.captured_queries
+            if not SAVEPOINT.match(query["sql"])
+        ]
+        executed = len(queries)
+        self.test_case.assertLessEqual(
+            executed,
+            self.num,
+            "%d queries executed, at most %d expected\nCaptured queries "
+            "were:\n%s"
+            % (
+                executed,
+                self.num,
+                "\n".join(
+                    "%d. %s" % (i, sql)
+                    for i, sql in enumerate(queries, start=1)
+                ),
+            ),
+        )
+
+
+class QueryBudgetMixin:
+    """
+    TestCase mixin failing tests whose requests issue more queries than
+    allowed, either a given number or the view's declared budget.
+    """
+
+    def assertMaxQueries(  # noqa: N802
+        self, num, func=None, *args, using=DEFAULT_DB_ALIAS, **kwargs
+    ):
+        context = _AssertMaxQueriesContext(self, num, connections[using])
+        if func is None:
+            return context
+        with context:
+            func(*args, **kwargs)
+        return None
+
+    def assertWithinQueryBudget(  # noqa: N802
+        self, method, view_name, using=DEFAULT_DB_ALIAS
+    ):
+        """
+        Usage::
+
+            with self.assertWithinQueryBudget("GET", "recipes-list"):
+                self.client.get("/api/recipes/")
+        """
+        budget = QUERY_BUDGETS.get((method, view_name))
+        if budget is None:
+            self.fail(f"No query budget declared for {method} {view_name}")
+        return self.assertMaxQueries(budget, using=using)
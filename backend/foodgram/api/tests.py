@@ -0,0 +1,543 @@
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            RecipeScore, ShoppingCart, Tag, TagRecipe)
+from recipes.popularity import decay
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.models import Follower, User
+
+from .authentication import token_cache
+from .management.commands.bench_recipe_create import make_image
+from .query_budgets import QUERY_BUDGETS
+from .shopping_list import shopping_list_cache
+from .testing import QueryBudgetMixin
+
+
+def create_user(name):
+    return User.objects.create_user(
+        username=name,
+        email=f"{name}@example.com",
+        password="password",
+        first_name=name,
+        last_name=name,
+    )
+
+
+def create_recipes(author, count, ingredients):
+    recipes = [
+        Recipe.objects.create(
+            author=author,
+            name=f"Рецепт {i}",
+            image="recipe.jpg",
+            text=f"Описание рецепта {i}",
+            cooking_time=10,
+        )
+        for i in range(count)
+    ]
+    IngredientRecipe.objects.bulk_create(
+        IngredientRecipe(recipe=recipe, ingredient=ingredient, amount=10)
+        for recipe in recipes
+        for ingredient in ingredients
+    )
+    return recipes
+
+
+class TemporaryMediaTestCase(TestCase):
+    """
+    Uploaded and generated images go to a temporary MEDIA_ROOT.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.TemporaryDirectory()
+        cls.media = override_settings(MEDIA_ROOT=cls.media_root.name)
+        cls.media.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.media.disable()
+        cls.media_root.cleanup()
+
+
+class ShoppingListQueriesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user("buyer")
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f"ингредиент {i}", measurement_unit="г"
+            )
+            for i in range(5)
+        ]
+        cls.recipes = create_recipes(cls.user, 20, cls.ingredients)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_queries_do_not_grow_with_the_cart(self):
+        for size in (1, 5, 20):
+            ShoppingCart.objects.filter(user=self.user).delete()
+            ShoppingCart.objects.bulk_create(
+                ShoppingCart(user=self.user, recipe=recipe)
+                for recipe in self.recipes[:size]
+            )
+            shopping_list_cache.clear()
+            for fmt in ("pdf", "txt"):
+                with self.subTest(size=size, format=fmt):
+                    with self.assertNumQueries(2):
+                        response = self.client.get(
+                            "/api/recipes/download_shopping_cart/",
+                            {"format": fmt},
+                        )
+                        content = b"".join(response)
+                    self.assertEqual(response.status_code, 200)
+                    self.assertTrue(content)
+
+    def test_errors_are_json(self):
+        for fmt in ("pdf", "txt", "csv"):
+            with self.subTest(format=fmt):
+                response = APIClient().get(
+                    "/api/recipes/download_shopping_cart/", {"format": fmt}
+                )
+                self.assertEqual(response.status_code, 401)
+                self.assertEqual(response["Content-Type"], "application/json")
+                self.assertIn("detail", response.json())
+
+
+class RecipeListQueriesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user("reader")
+        author = create_user("author")
+        ingredients = [
+            Ingredient.objects.create(name="соль", measurement_unit="г")
+        ]
+        recipes = create_recipes(author, 30, ingredients)
+        Favorite.objects.bulk_create(
+            Favorite(user=cls.user, recipe=recipe) for recipe in recipes[::2]
+        )
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=cls.user, recipe=recipe)
+            for recipe in recipes[::3]
+        )
+
+    def assert_queries_per_page_size(self, client, num, **params):
+        for limit in (1, 10, 30):
+            with self.subTest(limit=limit, **params):
+                with self.assertNumQueries(num):
+                    response = client.get(
+                        "/api/recipes/", {"limit": limit, **params}
+                    )
+                self.assertEqual(len(response.data["results"]), limit)
+
+    def test_authenticated_queries_do_not_grow_with_the_page(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assert_queries_per_page_size(client, 6)
+        response = client.get("/api/recipes/", {"limit": 30})
+        flags = {
+            (recipe["is_favorited"], recipe["is_in_shopping_cart"])
+            for recipe in response.data["results"]
+        }
+        self.assertEqual(
+            flags, {(True, True), (True, False), (False, True), (False, False)}
+        )
+
+    def test_anonymous_queries_do_not_grow_with_the_page(self):
+        client = APIClient()
+        self.assert_queries_per_page_size(client, 4)
+        response = client.get("/api/recipes/", {"limit": 30})
+        for recipe in response.data["results"]:
+            self.assertFalse(recipe["is_favorited"])
+            self.assertFalse(recipe["is_in_shopping_cart"])
+
+    def test_cursor_pages_are_not_counted(self):
+        client = APIClient()
+        self.assert_queries_per_page_size(client, 3, cursor="")
+        response = client.get("/api/recipes/", {"cursor": ""})
+        with self.assertNumQueries(3):
+            response = client.get(
+                "/api/recipes/",
+                {"cursor": ""},
+                HTTP_IF_NONE_MATCH=response["ETag"],
+            )
+        self.assertEqual(response.status_code, 304)
+
+
+class ExplainRecipeFiltersTest(TemporaryMediaTestCase):
+    """
+    Every recipe filter is planned with index scans on the seeded dataset.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("generate_data", recipes=500, stdout=StringIO())
+
+    def test_no_sequential_scans(self):
+        if connection.vendor == "postgresql":
+            # The seeded tables are small enough for the planner to prefer
+            # sequential scans, only check that an index can serve them.
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan TO off")
+        try:
+            call_command("explain_recipe_filters", stdout=StringIO())
+        except CommandError as error:
+            self.fail(error)
+
+
+class ConditionalRecipeTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user("author")
+        cls.recipes = create_recipes(cls.author, 3, [])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def test_detail_with_non_numeric_id_is_not_found(self):
+        response = self.client.get("/api/recipes/abc/")
+        self.assertEqual(response.status_code, 404)
+
+    def test_detail_not_modified(self):
+        url = f"/api/recipes/{self.recipes[0].pk}/"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_list_revalidates_by_etag_only(self):
+        response = self.client.get("/api/recipes/")
+        self.assertNotIn("Last-Modified", response)
+        etag = response["ETag"]
+        response = self.client.get("/api/recipes/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.recipes[0].delete()
+        for headers in (
+            {"HTTP_IF_NONE_MATCH": etag},
+            {"HTTP_IF_MODIFIED_SINCE": "Fri, 01 Jan 2100 00:00:00 GMT"},
+        ):
+            response = self.client.get("/api/recipes/", **headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data["results"]), 2)
+
+
+class QueryBudgetTest(QueryBudgetMixin, TemporaryMediaTestCase):
+    """
+    Every view stays within its budget in QUERY_BUDGETS on a cold token
+    cache.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user("reader")
+        cls.author = create_user("author")
+        cls.other = create_user("other")
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f"ингредиент {i}", measurement_unit="г"
+            )
+            for i in range(5)
+        ]
+        cls.tags = [
+            Tag.objects.create(
+                name=f"тег {i}", color=f"#00000{i}", slug=f"tag-{i}"
+            )
+            for i in range(2)
+        ]
+        cls.own = create_recipes(cls.user, 3, cls.ingredients)
+        cls.followed = create_recipes(cls.author, 5, cls.ingredients)
+        TagRecipe.objects.bulk_create(
+            TagRecipe(recipe=recipe, tag=tag)
+            for recipe in cls.own + cls.followed
+            for tag in cls.tags
+        )
+        Follower.objects.create(follower=cls.user, author=cls.author)
+        for recipe in cls.followed[:3]:
+            Favorite.objects.create(user=cls.user, recipe=recipe)
+            ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def get_requests(self):
+        recipe = self.own[0]
+        spare = self.followed[-1]
+        ingredients = [
+            {"id": ingredient.pk, "amount": 10}
+            for ingredient in self.ingredients
+        ]
+        data = {
+            "name": "Новый рецепт",
+            "text": "Описание",
+            "cooking_time": 15,
+            "tags": [tag.pk for tag in self.tags],
+            "ingredients": ingredients,
+        }
+        return [
+            ("GET", "/api/recipes/", {}),
+            ("POST", "/api/recipes/", {**data, "image": make_image()}),
+            ("GET", f"/api/recipes/{recipe.pk}/", {}),
+            (
+                "PUT",
+                f"/api/recipes/{recipe.pk}/",
+                {**data, "image": make_image()},
+            ),
+            (
+                "PATCH",
+                f"/api/recipes/{recipe.pk}/",
+                {**data, "ingredients": ingredients[:3]},
+            ),
+            ("DELETE", f"/api/recipes/{self.own[-1].pk}/", {}),
+            ("GET", "/api/recipes/download_shopping_cart/", {}),
+            ("GET", "/api/recipes/feed/", {}),
+            ("POST", f"/api/recipes/{spare.pk}/favorite/", {}),
+            ("DELETE", f"/api/recipes/{spare.pk}/favorite/", {}),
+            ("POST", f"/api/recipes/{spare.pk}/shopping_cart/", {}),
+            ("DELETE", f"/api/recipes/{spare.pk}/shopping_cart/", {}),
+            ("GET", "/api/users/", {}),
+            ("GET", f"/api/users/{self.author.pk}/", {}),
+            ("GET", "/api/users/me/", {}),
+            ("GET", "/api/users/subscriptions/", {"recipes_limit": 3}),
+            ("POST", f"/api/users/{self.other.pk}/subscribe/", {}),
+            ("DELETE", f"/api/users/{self.other.pk}/subscribe/", {}),
+            ("GET", "/api/tags/", {}),
+            ("GET", f"/api/tags/{self.tags[0].pk}/", {}),
+            ("GET", "/api/ingredients/", {"name": "инг"}),
+            ("GET", f"/api/ingredients/{self.ingredients[0].pk}/", {}),
+        ]
+
+    def send(self, method, path, data):
+        if method == "GET":
+            return self.client.get(path, data)
+        return getattr(self.client, method.lower())(path, data, format="json")
+
+    def test_views_within_query_budget(self):
+        checked = set()
+        for method, path, data in self.get_requests():
+            view_name = resolve(path).view_name
+            checked.add((method, view_name))
+            with self.subTest(method=method, view=view_name):
+                token_cache.clear()
+                with self.assertWithinQueryBudget(method, view_name):
+                    response = self.send(method, path, data)
+                    b"".join(response)
+                self.assertLess(response.status_code, 400)
+        self.assertEqual(checked, set(QUERY_BUDGETS))
+
+
+class DenormalizedFieldsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user("author")
+        cls.reader = create_user("reader")
+        cls.recipe = create_recipes(cls.author, 1, [])[0]
+
+    def test_full_save_keeps_counters(self):
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        author = User.objects.get(pk=self.author.pk)
+        Favorite.objects.create(user=self.reader, recipe=recipe)
+        ShoppingCart.objects.create(user=self.author, recipe=recipe)
+        Follower.objects.create(follower=self.reader, author=author)
+        recipe.name = "Новое название"
+        recipe.save()
+        author.first_name = "Новое имя"
+        author.save()
+        recipe.refresh_from_db()
+        author.refresh_from_db()
+        self.assertEqual(recipe.name, "Новое название")
+        self.assertEqual(recipe.favorites_count, 1)
+        self.assertEqual(author.first_name, "Новое имя")
+        self.assertEqual(author.recipes_count, 1)
+        self.assertEqual(author.followers_count, 1)
+        self.assertEqual(author.shopping_cart_version, 1)
+        self.assertIsNotNone(author.relations_modified_at)
+
+
+class CachedTokenTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user("buyer")
+        cls.follower = create_user("follower")
+        cls.recipe = create_recipes(cls.follower, 1, [])[0]
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        token_cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def test_save_of_cached_user_keeps_counters(self):
+        url = "/api/recipes/download_shopping_cart/"
+        response = self.client.get(url, {"format": "txt"})
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        ShoppingCart.objects.create(user=self.user, recipe=self.recipe)
+        Follower.objects.create(follower=self.follower, author=self.user)
+        response = self.client.post(
+            "/api/users/set_password/",
+            {"new_password": "n3w-Passw0rd", "current_password": "password"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 204)
+        user = User.objects.get(pk=self.user.pk)
+        self.assertTrue(user.check_password("n3w-Passw0rd"))
+        self.assertEqual(user.shopping_cart_version, 1)
+        self.assertEqual(user.followers_count, 1)
+        response = self.client.get(
+            url, {"format": "txt"}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+class RecipeUpdateTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user("author")
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f"ингредиент {i}", measurement_unit="г"
+            )
+            for i in range(3)
+        ]
+        cls.tags = [
+            Tag.objects.create(
+                name=f"тег {i}", color=f"#00000{i}", slug=f"tag-{i}"
+            )
+            for i in range(3)
+        ]
+        cls.recipe = create_recipes(cls.author, 1, cls.ingredients)[0]
+        TagRecipe.objects.bulk_create(
+            TagRecipe(recipe=cls.recipe, tag=tag) for tag in cls.tags
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+        self.url = f"/api/recipes/{self.recipe.pk}/"
+
+    def test_removed_tags_touch_the_recipe_once(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.patch(
+                self.url, {"tags": [self.tags[0].pk]}, format="json"
+            )
+        self.assertEqual(response.status_code, 200)
+        updates = [
+            query["sql"]
+            for query in context.captured_queries
+            if query["sql"].startswith('UPDATE "recipes_recipe"')
+        ]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(
+            list(self.recipe.tags.values_list("tag", flat=True)),
+            [self.tags[0].pk],
+        )
+
+    def test_search_vector_is_not_read_or_written_back(self):
+        with CaptureQueriesContext(connection) as context:
+            self.client.get("/api/recipes/")
+            self.client.get(self.url)
+            response = self.client.patch(
+                self.url, {"name": "Новое название"}, format="json"
+            )
+        self.assertEqual(response.status_code, 200)
+        for query in context.captured_queries:
+            sql = query["sql"]
+            if sql.startswith("SELECT") or '"modified_at" =' in sql:
+                self.assertNotIn("search_vector", sql)
+
+    def test_ingredients_are_synced_in_place(self):
+        buyer = create_user("buyer")
+        ShoppingCart.objects.create(user=buyer, recipe=self.recipe)
+        kept = IngredientRecipe.objects.get(
+            recipe=self.recipe, ingredient=self.ingredients[1]
+        )
+        ingredients = [
+            {"id": self.ingredients[0].pk, "amount": 20},
+            {"id": self.ingredients[1].pk, "amount": 10},
+        ]
+        with self.assertNumQueries(17):
+            response = self.client.patch(
+                self.url, {"ingredients": ingredients}, format="json"
+            )
+        self.assertEqual(response.status_code, 200)
+        rows = IngredientRecipe.objects.filter(recipe=self.recipe)
+        self.assertEqual(
+            sorted(rows.values_list("ingredient", "amount")),
+            [(self.ingredients[0].pk, 20), (self.ingredients[1].pk, 10)],
+        )
+        self.assertTrue(rows.filter(pk=kept.pk).exists())
+        buyer.refresh_from_db()
+        self.assertEqual(buyer.shopping_cart_version, 2)
+
+    def test_unknown_and_repeated_ingredients_are_reported_together(self):
+        pk = self.ingredients[0].pk
+        ingredients = [
+            {"id": pk, "amount": 10},
+            {"id": pk, "amount": 20},
+            {"id": 9999, "amount": 10},
+        ]
+        response = self.client.patch(
+            self.url, {"ingredients": ingredients}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.data["ingredients"],
+            [
+                "Ингредиенты не найдены: 9999",
+                f"Ингредиенты повторяются: {pk}",
+            ],
+        )
+        self.assertEqual(
+            IngredientRecipe.objects.filter(recipe=self.recipe).count(), 3
+        )
+
+
+class PopularityTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user("author")
+        cls.readers = [create_user(f"reader{i}") for i in range(2)]
+        cls.recipe = create_recipes(cls.author, 1, [])[0]
+
+    def get_score(self):
+        return RecipeScore.objects.get(recipe=self.recipe)
+
+    def test_removal_leaves_trending_scores_to_decay(self):
+        old, new = (
+            Favorite(user=reader, recipe=self.recipe)
+            for reader in self.readers
+        )
+        old.save()
+        decay(24)
+        decayed = self.get_score()
+        new.save()
+        old.delete()
+        score = self.get_score()
+        self.assertEqual(score.score_all, 1.0)
+        self.assertAlmostEqual(score.score_24h, decayed.score_24h + 1.0)
+        self.assertAlmostEqual(score.score_7d, decayed.score_7d + 1.0)
+
+    def test_rebuild(self):
+        Favorite.objects.create(user=self.readers[0], recipe=self.recipe)
+        ShoppingCart.objects.create(user=self.readers[1], recipe=self.recipe)
+        RecipeScore.objects.update(score_24h=0, score_7d=0, score_all=0)
+        call_command("decay_popularity", rebuild=True, stdout=StringIO())
+        score = self.get_score()
+        self.assertEqual(
+            (score.score_24h, score.score_7d, score.score_all),
+            (1.5, 1.5, 1.5),
+        )
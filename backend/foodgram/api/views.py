@@ -1,31 +1,47 @@
-import os
+import io
 
-from django.http import FileResponse
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (BooleanField, Exists, OuterRef, Prefetch,
+                              Subquery, Value)
+from django.http import FileResponse, Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_cache_control
 from djoser.views import UserViewSet
-from fpdf import FPDF
-from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
-                            ShoppingCart, Tag, TagRecipe)
+from recipes.images import schedule_variants
+from recipes.models import (Favorite, FeedEntry, Ingredient, IngredientRecipe,
+                            Recipe, ShoppingCart, Tag, TagRecipe)
+from recipes.popularity import ORDERINGS
+from recipes.signals import batch_recipe_changes, batch_shopping_cart_version
 from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.mixins import ListModelMixin, RetrieveModelMixin
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import GenericViewSet, ModelViewSet
 from users.models import Follower, User
 
+from .cache import CatalogCache
+from .conditional import conditional_response, get_validators, set_validators
 from .filters import RecipeFilterBackend
-from .pagination import StandardResultsSetPagination
+from .ingredient_index import ingredient_index
+from .mixins import CachedCatalogMixin
+from .pagination import FeedPagination, StandardResultsSetPagination
 from .permissions import IsAuthorOrStaffOrReadOnly
+from .renderers import SHOPPING_LIST_RENDERERS, FileRenderer
 from .serializers import (FollowerSerializer, IngredientSerializer,
                           RecipeSerializer, RecipeShortSerializer,
                           TagSerializer, UserSerializer,
                           UserSuccesfullSignUpSerializer)
+from .shopping_list import (get_cached_pdf, shopping_list_etag,
+                            stream_shopping_list)
 
 
 class CustomUserViewset(UserViewSet):
     pagination_class = StandardResultsSetPagination
+    cursor_ordering = ("id",)
 
     def create(self, request, *args, **kwargs):
         serializer = UserSerializer(data=request.data)
@@ -49,6 +65,22 @@ class CustomUserViewset(UserViewSet):
         self.get_object = self.get_instance
         return self.retrieve(request, *args, **kwargs)
 
+    def annotate_subscriptions(self, queryset):
+        """
+        Prefetch at most recipes_limit of the authors' recipes per author in
+        the database.
+        """
+        recipes = Recipe.objects.defer("search_vector")
+        recipes_limit = self.request.query_params.get("recipes_limit")
+        if recipes_limit is not None and recipes_limit.isdigit():
+            latest_recipes = Recipe.objects.filter(
+                author=OuterRef("author")
+            ).values("pk")[: int(recipes_limit)]
+            recipes = recipes.filter(pk__in=Subquery(latest_recipes))
+        return queryset.annotate(
+            is_subscribed=Value(True, output_field=BooleanField()),
+        ).prefetch_related(Prefetch("recipes", queryset=recipes))
+
     @action(["post", "delete"], detail=True)
     def subscribe(self, request, *args, **kwargs):
         if request.method == "POST":
@@ -63,6 +95,9 @@ class CustomUserViewset(UserViewSet):
                 if status_obj is False:
                     return Response(status=status.HTTP_400_BAD_REQUEST)
                 else:
+                    author = self.annotate_subscriptions(
+                        User.objects.filter(pk=author.pk)
+                    ).get()
                     contex = {"request": request}
                     serializer = FollowerSerializer(author, context=contex)
                     headers = self.get_success_headers(serializer.data)
@@ -94,7 +129,9 @@ class CustomUserViewset(UserViewSet):
     )
     def subscriptions(self, request, *args, **kwargs):
         follower_qs = Follower.objects.filter(follower=request.user)
-        queryset = User.objects.filter(author__in=follower_qs)
+        queryset = self.annotate_subscriptions(
+            User.objects.filter(author__in=follower_qs).order_by("id")
+        )
         contex = {"request": request}
         page = self.paginate_queryset(queryset)
         if page is not None:
@@ -104,8 +141,11 @@ class CustomUserViewset(UserViewSet):
         return Response(serializer.data)
 
 
-class TagViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixin):
+class TagViewSet(
+    CachedCatalogMixin, GenericViewSet, RetrieveModelMixin, ListModelMixin
+):
     queryset = Tag.objects.all()
+    catalog_cache = CatalogCache(Tag, settings.CATALOG_CACHE_TTL)
     serializer_class = TagSerializer
     pagination_class = None
     permission_classes = [
@@ -114,7 +154,7 @@ class TagViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixin):
 
 
 class RecipeViewSet(ModelViewSet):
-    queryset = Recipe.objects.all()
+    queryset = Recipe.objects.defer("search_vector")
     serializer_class = RecipeSerializer
     permission_classes = [
         IsAuthorOrStaffOrReadOnly,
@@ -124,12 +164,104 @@ class RecipeViewSet(ModelViewSet):
         RecipeFilterBackend,
     ]
 
+    @property
+    def cursor_ordering(self):
+        """
+        Popularity orderings are paged by number, the scores move too
+        often for a keyset cursor.
+        """
+        if self.request.query_params.get("ordering") in ORDERINGS:
+            return None
+        return ("-pub_date", "-id")
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        # The validators come from the rows of the page itself, recipes
+        # deleted or leaving the filter change the ids on the page or the
+        # state of the paginator.
+        rows = [(recipe.pk, recipe.modified_at) for recipe in page]
+        modified_at = max((stamp for _, stamp in rows), default=None)
+        etag, _ = get_validators(
+            request,
+            modified_at,
+            request.get_full_path(),
+            rows,
+            self.paginator.get_page_state(),
+        )
+        response = conditional_response(request, etag, None)
+        if response is None:
+            serializer = self.get_serializer(page, many=True)
+            response = self.get_paginated_response(serializer.data)
+            set_validators(response, etag, None)
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        # Errors of the file downloads are JSON, not a broken file.
+        renderer = getattr(request, "accepted_renderer", None)
+        if response.status_code >= 400 and isinstance(renderer, FileRenderer):
+            request.accepted_renderer = JSONRenderer()
+            request.accepted_media_type = JSONRenderer.media_type
+        return super().finalize_response(request, response, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            pk = int(kwargs["pk"])
+        except (TypeError, ValueError):
+            raise Http404
+        modified_at = (
+            Recipe.objects.filter(pk=pk)
+            .values_list("modified_at", flat=True)
+            .first()
+        )
+        if modified_at is None:
+            raise Http404
+        etag, last_modified = get_validators(
+            request, modified_at, "recipe", pk
+        )
+        response = conditional_response(request, etag, last_modified)
+        if response is None:
+            response = super().retrieve(request, *args, **kwargs)
+            set_validators(response, etag, last_modified)
+        return response
+
+    def get_queryset(self):
+        queryset = (
+            super()
+            .get_queryset()
+            .select_related("author")
+            .prefetch_related(
+                Prefetch(
+                    "tags", queryset=TagRecipe.objects.select_related("tag")
+                ),
+                Prefetch(
+                    "ingredients",
+                    queryset=IngredientRecipe.objects.select_related(
+                        "ingredient"
+                    ),
+                ),
+            )
+        )
+        user = self.request.user
+        if user.is_anonymous:
+            return queryset
+        return queryset.annotate(
+            is_favorited=Exists(
+                Favorite.objects.filter(user=user, recipe=OuterRef("pk"))
+            ),
+            is_in_shopping_cart=Exists(
+                ShoppingCart.objects.filter(user=user, recipe=OuterRef("pk"))
+            ),
+        )
+
+    @transaction.atomic
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         ingredients = serializer.validated_data.pop("ingredients")
         tags = serializer.validated_data.pop("tags")
         recipe = serializer.save(author=self.request.user)
+        schedule_variants(recipe.image)
         TagRecipe.objects.bulk_create(
             [TagRecipe(recipe=recipe, tag=tag) for tag in tags]
         )
@@ -137,14 +269,13 @@ class RecipeViewSet(ModelViewSet):
             [
                 IngredientRecipe(
                     recipe=recipe,
-                    ingredient=Ingredient.objects.get(
-                        pk=ingredient["ingredient"]
-                    ),
+                    ingredient=ingredient["ingredient"],
                     amount=ingredient["amount"],
                 )
                 for ingredient in ingredients
             ]
         )
+        recipe = self.get_queryset().get(pk=recipe.pk)
         serializer_created = self.get_serializer(recipe)
         headers = self.get_success_headers(serializer_created.data)
         return Response(
@@ -153,6 +284,7 @@ class RecipeViewSet(ModelViewSet):
             headers=headers,
         )
 
+    @transaction.atomic
     def update(self, request, *args, **kwargs):
         partial = kwargs.pop("partial", False)
         instance = self.get_object()
@@ -160,109 +292,145 @@ class RecipeViewSet(ModelViewSet):
             instance, data=request.data, partial=partial
         )
         serializer.is_valid(raise_exception=True)
-        ingredients_data = serializer.validated_data.pop("ingredients")
-        tags_data = serializer.validated_data.pop("tags")
+        ingredients_data = serializer.validated_data.pop("ingredients", None)
+        tags_data = serializer.validated_data.pop("tags", None)
+        image_changed = "image" in serializer.validated_data
+        if image_changed:
+            serializer.validated_data["image_variants"] = {}
         recipe = serializer.save()
-        tag_id_list = []
-        for tag_data in tags_data:
-            tag_id_list.append(tag_data.pk)
-        ingredients_id_list = []
-        for ingredient_data in ingredients_data:
-            ingredients_id_list.append(ingredient_data["ingredient"])
-        for tag in instance.tags.all():
-            if tag.tag.pk not in tag_id_list:
-                tag_recipe_obj = TagRecipe.objects.get(
-                    tag=tag.tag, recipe=instance
-                )
-                tag_recipe_obj.delete()
-        for tag in tags_data:
-            tag, status = TagRecipe.objects.get_or_create(
-                tag=tag, recipe=instance
-            )
-        for ingredient in instance.ingredients.all():
-            if ingredient.ingredient.pk not in ingredients_id_list:
-                ingredient_recipe_obj = IngredientRecipe.objects.get(
-                    ingredient=ingredient.ingredient, recipe=instance
-                )
-                ingredient_recipe_obj.delete()
-        for ingredient in ingredients_data:
-            ingredient_obj = Ingredient.objects.get(
-                pk=ingredient["ingredient"]
-            )
-            (
-                ingredient_recipe_obj,
-                status,
-            ) = IngredientRecipe.objects.get_or_create(
-                ingredient=ingredient_obj,
-                recipe=instance,
-                amount=ingredient["amount"],
-            )
-
-        if getattr(instance, "_prefetched_objects_cache", None):
-            instance._prefetched_objects_cache = {}
+        if image_changed:
+            schedule_variants(recipe.image)
+        if tags_data is not None:
+            # serializer.save() has already bumped modified_at.
+            with batch_recipe_changes():
+                self.sync_tags(recipe, tags_data)
+        if ingredients_data is not None:
+            with batch_shopping_cart_version(shopping_cart__recipe=recipe):
+                self.sync_ingredients(recipe, ingredients_data)
+        recipe = self.get_queryset().get(pk=recipe.pk)
         serializer_updated = self.get_serializer(recipe)
         return Response(serializer_updated.data)
 
+    def sync_tags(self, recipe, tags_data):
+        current = {tag_recipe.tag_id for tag_recipe in recipe.tags.all()}
+        new = {tag.pk: tag for tag in tags_data}
+        removed = current - new.keys()
+        if removed:
+            TagRecipe.objects.filter(recipe=recipe, tag__in=removed).delete()
+        TagRecipe.objects.bulk_create(
+            [
+                TagRecipe(recipe=recipe, tag=tag)
+                for pk, tag in new.items()
+                if pk not in current
+            ]
+        )
+
+    def sync_ingredients(self, recipe, ingredients_data):
+        current = {
+            ingredient_recipe.ingredient_id: ingredient_recipe
+            for ingredient_recipe in recipe.ingredients.all()
+        }
+        new = {
+            ingredient["ingredient"].pk: ingredient
+            for ingredient in ingredients_data
+        }
+        removed = [
+            ingredient_recipe.pk
+            for pk, ingredient_recipe in current.items()
+            if pk not in new
+        ]
+        created = []
+        changed = []
+        for pk, ingredient in new.items():
+            ingredient_recipe = current.get(pk)
+            if ingredient_recipe is None:
+                created.append(
+                    IngredientRecipe(
+                        recipe=recipe,
+                        ingredient=ingredient["ingredient"],
+                        amount=ingredient["amount"],
+                    )
+                )
+            elif ingredient_recipe.amount != ingredient["amount"]:
+                ingredient_recipe.amount = ingredient["amount"]
+                changed.append(ingredient_recipe)
+        if removed:
+            IngredientRecipe.objects.filter(pk__in=removed).delete()
+        IngredientRecipe.objects.bulk_create(created)
+        IngredientRecipe.objects.bulk_update(changed, ["amount"])
+
     @action(
         detail=False,
         methods=[
             "get",
         ],
+        permission_classes=[
+            IsAuthenticated,
+        ],
     )
-    def download_shopping_cart(self, request, *args, **kwargs):
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.add_font(
-            "DejaVu", "", "api/fonts/DejaVuSerifCondensed.ttf", uni=True
+    def feed(self, request, *args, **kwargs):
+        """
+        Recipes of the followed authors, newest first. Authors above the
+        fan-out limit are read from the recipe table.
+        """
+        user = request.user
+        sources = [
+            (FeedEntry.objects.filter(user=user), ("pub_date", "recipe_id"))
+        ]
+        popular_authors = User.objects.filter(
+            author__follower=user,
+            followers_count__gt=settings.FEED_FANOUT_LIMIT,
         )
-        pdf.set_font("DejaVu", "", 16)
-        pdf.cell(200, 10, txt="Ваш список покупок:", ln=1, align="C")
-        shopping_cart_qs = ShoppingCart.objects.filter(user=request.user)
-        result = []
-        for item in shopping_cart_qs:
-            ingredients = item.recipe.ingredients.all()
-            for ingredient in ingredients:
-                full_ingredient = (
-                    ingredient.ingredient.name,
-                    ingredient.ingredient.measurement_unit,
-                    ingredient.amount,
+        if popular_authors.exists():
+            sources.append(
+                (
+                    Recipe.objects.filter(author__in=popular_authors),
+                    ("pub_date", "id"),
                 )
-                result.append(full_ingredient)
-        if len(result) > 0:
-            pdf.set_font("DejaVu", "", 14)
-            result.sort()
-            amount = result[0][2]
-            for i in range(1, len(result)):
-                if result[i][0] == result[i - 1][0]:
-                    amount += result[i][2]
-                    if i == len(result) - 1:
-                        pdf.cell(
-                            0,
-                            10,
-                            txt=f"{result[i][0]} ({result[i][1]}) - {amount}",
-                            ln=1,
-                            align="L",
-                        )
-                else:
-                    pdf.cell(
-                        0,
-                        10,
-                        txt=f"{result[i-1][0]} ({result[i-1][1]}) - {amount}",
-                        ln=1,
-                        align="L",
-                    )
-                    amount = result[i][2]
-        else:
-            pdf.cell(
-                0,
-                10,
-                txt="Вы ещё не добавили рецепты в список покупок :(",
-                ln=1,
-                align="L",
             )
-        pdf.output(f"data/tmp_{request.user}.pdf", "F")
-        response = FileResponse(open(f"data/tmp_{request.user}.pdf", "rb"))
-        os.remove(f"data/tmp_{request.user}.pdf")
+        paginator = FeedPagination()
+        ids = paginator.paginate_sources(sources, request)
+        recipes = self.get_queryset().in_bulk(ids)
+        serializer = self.get_serializer(
+            [recipes[pk] for pk in ids if pk in recipes], many=True
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=[
+            "get",
+        ],
+        permission_classes=[
+            IsAuthenticated,
+        ],
+        renderer_classes=SHOPPING_LIST_RENDERERS,
+    )
+    def download_shopping_cart(self, request, *args, **kwargs):
+        renderer = request.accepted_renderer
+        request.user.refresh_from_db(fields=["shopping_cart_version"])
+        etag = shopping_list_etag(request.user, renderer.format)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            filename = f"shopping_list.{renderer.format}"
+            if renderer.format == "pdf":
+                content, cached = get_cached_pdf(request.user)
+                response = FileResponse(
+                    io.BytesIO(content),
+                    as_attachment=True,
+                    filename=filename,
+                    content_type=renderer.media_type,
+                )
+                response["X-Cache"] = "HIT" if cached else "MISS"
+            else:
+                response = StreamingHttpResponse(
+                    stream_shopping_list(request.user, renderer.format),
+                    content_type=f"{renderer.media_type}; charset=utf-8",
+                )
+                disposition = f'attachment; filename="{filename}"'
+                response["Content-Disposition"] = disposition
+        response["ETag"] = etag
+        patch_cache_control(response, private=True, no_cache=True)
         return response
 
 
@@ -270,7 +438,9 @@ class ShoppingCartView(APIView):
     def post(self, request, *args, **kwargs):
         pk = kwargs.get("recipe_id")
         if pk is not None and str(pk).isdigit():
-            recipe = get_object_or_404(Recipe, pk=int(pk))
+            recipe = get_object_or_404(
+                Recipe.objects.defer("search_vector"), pk=int(pk)
+            )
             serializer = RecipeShortSerializer(recipe)
             shopping_cart, status_obj = ShoppingCart.objects.get_or_create(
                 user=request.user, recipe=recipe
@@ -287,7 +457,9 @@ class ShoppingCartView(APIView):
     def delete(self, request, *args, **kwargs):
         pk = kwargs.get("recipe_id")
         if pk is not None and str(pk).isdigit():
-            recipe = get_object_or_404(Recipe, pk=int(pk))
+            recipe = get_object_or_404(
+                Recipe.objects.defer("search_vector"), pk=int(pk)
+            )
             instance = get_object_or_404(
                 ShoppingCart, recipe=recipe, user=request.user
             )
@@ -301,7 +473,9 @@ class FavoriteView(APIView):
     def post(self, request, *args, **kwargs):
         pk = kwargs.get("recipe_id")
         if pk is not None and str(pk).isdigit():
-            recipe = get_object_or_404(Recipe, pk=int(pk))
+            recipe = get_object_or_404(
+                Recipe.objects.defer("search_vector"), pk=int(pk)
+            )
             serializer = RecipeShortSerializer(recipe)
             favorite, status_obj = Favorite.objects.get_or_create(
                 user=request.user, recipe=recipe
@@ -318,7 +492,9 @@ class FavoriteView(APIView):
     def delete(self, request, *args, **kwargs):
         pk = kwargs.get("recipe_id")
         if pk is not None and str(pk).isdigit():
-            recipe = get_object_or_404(Recipe, pk=int(pk))
+            recipe = get_object_or_404(
+                Recipe.objects.defer("search_vector"), pk=int(pk)
+            )
             instance = get_object_or_404(
                 Favorite, recipe=recipe, user=request.user
             )
@@ -335,9 +511,21 @@ class IngredientViewSet(GenericViewSet, RetrieveModelMixin, ListModelMixin):
         AllowAny,
     ]
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get("name")
+        limit = settings.INGREDIENT_SEARCH_LIMIT if name else None
+        if settings.INGREDIENT_INDEX_ENABLED:
+            return Response(ingredient_index.search(name, limit))
+        serializer = self.get_serializer(
+            self.get_queryset()[:limit], many=True
+        )
+        return Response(serializer.data)
+
     def get_queryset(self):
         name = self.request.query_params.get("name")
         if name is not None:
-            return Ingredient.objects.filter(name__startswith=name.lower())
+            return Ingredient.objects.filter(
+                name__startswith=name.lower()
+            ).order_by("name")
         else:
             return Ingredient.objects.all()
@@ -41,6 +41,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "api.middleware.QueryInstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -141,7 +142,7 @@ REST_FRAMEWORK = {
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 10,
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework.authentication.TokenAuthentication",
+        "api.authentication.CachedTokenAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
@@ -155,6 +156,42 @@ PAGE_SIZE_QUERY_PARAM = "limit"
 
 MAX_PAGE_SIZE = 100
 
+INGREDIENT_INDEX_ENABLED = bool(
+    int(os.getenv("INGREDIENT_INDEX_ENABLED", "1"))
+)
+
+INGREDIENT_INDEX_TTL = int(os.getenv("INGREDIENT_INDEX_TTL", "300"))
+
+INGREDIENT_SEARCH_LIMIT = 100
+
+CATALOG_CACHE_TTL = int(os.getenv("CATALOG_CACHE_TTL", "300"))
+
+SHOPPING_LIST_CACHE_SIZE = int(os.getenv("SHOPPING_LIST_CACHE_SIZE", "256"))
+
+IMAGE_VARIANTS = {
+    "thumbnail": {"size": 480, "format": "JPEG"},
+    "thumbnail_webp": {"size": 480, "format": "WEBP"},
+    "webp": {"size": 1280, "format": "WEBP"},
+}
+
+IMAGE_VARIANT_WORKERS = int(os.getenv("IMAGE_VARIANT_WORKERS", "2"))
+
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "1024"))
+
+TOKEN_CACHE_TTL = int(os.getenv("TOKEN_CACHE_TTL", "60"))
+
+TOKEN_CACHE_STATS_INTERVAL = 1000
+
+SEARCH_CONFIG = "russian"
+
+FEED_FANOUT_LIMIT = int(os.getenv("FEED_FANOUT_LIMIT", "1000"))
+
+POPULARITY_WEIGHTS = {"favorite": 1.0, "shopping_cart": 0.5}
+
+POPULARITY_EPSILON = 0.01
+
+SQL_INSTRUMENTATION = bool(int(os.getenv("SQL_INSTRUMENTATION", "0")))
+
 DJOSER = {
     "SERIALIZERS": {
         "user": "api.serializers.UserGetSerializer",
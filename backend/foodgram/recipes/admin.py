@@ -13,12 +13,9 @@ class IngredientAdmin(admin.ModelAdmin):
 
 
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ("name", "author", "count_favorite")
+    list_display = ("name", "author", "favorites_count")
     list_filter = ("author", "name", "tags__tag")
-
-    @admin.display(description="favorite")
-    def count_favorite(self, obj):
-        return Favorite.objects.filter(recipe=obj).count()
+    list_select_related = ("author",)
 
 
 class TagAdmin(admin.ModelAdmin):
@@ -0,0 +1,81 @@
+from django.conf import settings
+from django.db import connection
+from users.models import Follower, User
+
+from .models import FeedEntry, Recipe
+
+BATCH_SIZE = 1000
+
+
+def is_fanned_out(author_id):
+    """
+    Recipes of authors with more followers than FEED_FANOUT_LIMIT are not
+    copied into timelines, the feed reads them from the recipe table.
+    """
+    return User.objects.filter(
+        pk=author_id, followers_count__lte=settings.FEED_FANOUT_LIMIT
+    ).exists()
+
+
+def fan_out(recipe):
+    """
+    Add a new recipe to the timelines of its author's followers.
+    """
+    if not is_fanned_out(recipe.author_id):
+        return
+    followers = Follower.objects.filter(author=recipe.author_id).values_list(
+        "follower", flat=True
+    )
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(
+                user_id=follower, recipe=recipe, pub_date=recipe.pub_date
+            )
+            for follower in followers.iterator()
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(follower_id, author_id):
+    """
+    Add the recipes of a newly followed author to the follower's timeline.
+    """
+    if not is_fanned_out(author_id):
+        return
+    recipes = Recipe.objects.filter(author=author_id).values_list(
+        "pk", "pub_date"
+    )
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(user_id=follower_id, recipe_id=pk, pub_date=pub_date)
+            for pk, pub_date in recipes.iterator()
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def prune(follower_id, author_id):
+    FeedEntry.objects.filter(
+        user=follower_id, recipe__author=author_id
+    ).delete()
+
+
+def rebuild_feed():
+    """
+    Fill every timeline from the subscriptions, for rows written without
+    signals.
+    """
+    FeedEntry.objects.all().delete()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO recipes_feedentry (user_id, recipe_id, pub_date) "
+            "SELECT follower.follower_id, recipe.id, recipe.pub_date "
+            "FROM users_follower follower "
+            "JOIN users_user author ON author.id = follower.author_id "
+            "JOIN recipes_recipe recipe ON recipe.author_id = author.id "
+            "WHERE author.followers_count <= %s",
+            [settings.FEED_FANOUT_LIMIT],
+        )
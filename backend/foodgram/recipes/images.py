@@ -0,0 +1,129 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = {"JPEG": "jpg", "WEBP": "webp"}
+
+_executor = {}
+_executor_lock = Lock()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Files are named after their content, so saving a name that already
+    exists keeps the stored copy instead of writing a duplicate.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is not None and self.exists(name):
+            return name
+        return super().save(name, content, max_length)
+
+
+def variant_name(name, variant):
+    stem = os.path.splitext(os.path.basename(name))[0]
+    extension = EXTENSIONS[settings.IMAGE_VARIANTS[variant]["format"]]
+    return f"variants/{stem}_{variant}.{extension}"
+
+
+def render_variants(path, targets):
+    """
+    Write the resized copies of the image at ``path``.
+
+    ``targets`` maps a variant to its ``(path, size, format)``, existing
+    files are kept. Runs in a worker process, so it only touches files.
+    """
+    with Image.open(path) as image:
+        image.load()
+        for target, size, image_format in targets.values():
+            if os.path.exists(target):
+                continue
+            variant = image.copy()
+            variant.thumbnail((size, size))
+            if image_format == "JPEG" and variant.mode != "RGB":
+                variant = variant.convert("RGB")
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            temporary = f"{target}.{os.getpid()}.tmp"
+            variant.save(temporary, image_format)
+            os.replace(temporary, target)
+    return list(targets)
+
+
+def get_targets(storage, name):
+    targets = {}
+    for variant, options in settings.IMAGE_VARIANTS.items():
+        targets[variant] = (
+            storage.path(variant_name(name, variant)),
+            options["size"],
+            options["format"],
+        )
+    return targets
+
+
+def store_variants(name, variants):
+    """
+    Point every recipe using the image ``name`` at its variants.
+    """
+    from .models import Recipe
+
+    Recipe.objects.filter(image=name).update(
+        image_variants={
+            variant: variant_name(name, variant) for variant in variants
+        },
+        modified_at=timezone.now(),
+    )
+
+
+def get_executor():
+    with _executor_lock:
+        if "executor" not in _executor:
+            _executor["executor"] = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_VARIANT_WORKERS
+            )
+    return _executor["executor"]
+
+
+def generate_variants(storage, name):
+    variants = render_variants(storage.path(name), get_targets(storage, name))
+    store_variants(name, variants)
+
+
+def _variants_done(name, future):
+    close_old_connections()
+    try:
+        store_variants(name, future.result())
+    except Exception:
+        logger.exception("Could not generate the variants of %s", name)
+
+
+def schedule_variants(image):
+    """
+    Generate the variants of a saved image once the transaction commits,
+    in the worker pool or inline when IMAGE_VARIANT_WORKERS is 0.
+    """
+    name = image.name
+    storage = image.storage
+
+    def submit():
+        if not settings.IMAGE_VARIANT_WORKERS:
+            generate_variants(storage, name)
+            return
+        future = get_executor().submit(
+            render_variants, storage.path(name), get_targets(storage, name)
+        )
+        future.add_done_callback(
+            lambda future: _variants_done(name, future)
+        )
+
+    transaction.on_commit(submit)
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from recipes.popularity import decay, rebuild_popularity
+
+
+class Command(BaseCommand):
+    help = (
+        "Decay the 24 hour and 7 day popularity scores by the time since "
+        "the previous run, meant to be run periodically, for example "
+        "hourly from cron with --hours 1."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hours",
+            type=float,
+            default=1.0,
+            help="Hours elapsed since the previous run.",
+        )
+        parser.add_argument("--batch-size", type=int, default=10000)
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Score every recipe again from its favorites and shopping "
+            "carts instead.",
+        )
+
+    def handle(self, *args, **options):
+        if options["rebuild"]:
+            rebuild_popularity()
+            self.stdout.write("popularity scores rebuilt")
+            return
+        if options["hours"] <= 0:
+            raise CommandError("--hours must be positive")
+        updated = decay(options["hours"], options["batch_size"])
+        self.stdout.write(f"{updated} scores decayed")
@@ -1,17 +1,80 @@
+import csv
 import json
+import os
+import time
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 from recipes.models import Ingredient
 
 
+def read_json(f, chunk_size=65536):
+    """
+    Decode the objects of a top-level JSON array one by one.
+    """
+    decoder = json.JSONDecoder()
+    buffer = f.read(chunk_size).lstrip()
+    if not buffer.startswith("["):
+        raise CommandError("Expected a JSON array of ingredients")
+    buffer = buffer[1:]
+    while True:
+        buffer = buffer.lstrip().lstrip(",").lstrip()
+        if buffer.startswith("]"):
+            return
+        try:
+            data, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                raise CommandError("Unexpected end of the JSON file")
+            buffer += chunk
+            continue
+        yield data["name"], data["measurement_unit"]
+        buffer = buffer[end:]
+
+
+def read_csv(f):
+    for row in csv.reader(f):
+        if row:
+            yield row[0], row[1]
+
+
 class Command(BaseCommand):
+    help = "Load the ingredient catalog, skipping ingredients already stored."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?", default="data/ingredients.json")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
     def handle(self, *args, **options):
-        with open("data/ingredients.json") as f:
-            data_list = json.load(f)
-
-        for data in data_list:
-            Ingredient.objects.all().delete
-            Ingredient.objects.get_or_create(
-                name=data["name"], measurement_unit=data["measurement_unit"]
-            )
-        print("added fixtures")
+        path = options["path"]
+        extension = os.path.splitext(path)[1].lower()
+        if extension not in (".json", ".csv"):
+            raise CommandError("Only .json and .csv files are supported")
+        batch_size = options["batch_size"]
+        start = time.perf_counter()
+        seen = set()
+        batch = []
+        rows = 0
+        with open(path, encoding="utf-8") as f, transaction.atomic():
+            before = Ingredient.objects.count()
+            reader = read_json(f) if extension == ".json" else read_csv(f)
+            for name, measurement_unit in reader:
+                rows += 1
+                key = (name.strip(), measurement_unit.strip())
+                if key in seen:
+                    continue
+                seen.add(key)
+                batch.append(Ingredient(name=key[0], measurement_unit=key[1]))
+                if len(batch) >= batch_size:
+                    Ingredient.objects.bulk_create(
+                        batch, ignore_conflicts=True
+                    )
+                    batch = []
+            Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+            added = Ingredient.objects.count() - before
+        elapsed = time.perf_counter() - start
+        print(
+            f"added fixtures: {added} new of {rows} rows "
+            f"in {elapsed:.2f} s ({rows / max(elapsed, 1e-9):.0f} rows/s)"
+        )
@@ -0,0 +1,394 @@
+import csv
+import hashlib
+import io
+import itertools
+import json
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from PIL import Image
+from recipes.feed import rebuild_feed
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingCart, Tag, TagRecipe)
+from recipes.popularity import rebuild_popularity
+from recipes.search import rebuild_search_index
+from users.models import Follower, User
+
+
+def zipf_cum_weights(n, s):
+    """
+    Cumulative weights of ranks 1..n under a Zipf distribution.
+    """
+    return list(itertools.accumulate(1 / rank**s for rank in range(1, n + 1)))
+
+
+class ZipfSampler:
+    """
+    Draws items with Zipfian frequencies, the popular items are spread
+    over the population instead of being the first ones.
+    """
+
+    def __init__(self, rng, population, s):
+        self.rng = rng
+        self.population = list(population)
+        rng.shuffle(self.population)
+        self.cum_weights = zipf_cum_weights(len(self.population), s)
+
+    def sample(self):
+        (item,) = self.rng.choices(
+            self.population, cum_weights=self.cum_weights
+        )
+        return item
+
+    def sample_distinct(self, k, exclude=None):
+        """
+        Up to ``k`` distinct items, at most half of the population so the
+        rare tail never has to be exhausted.
+        """
+        k = min(k, max(1, len(self.population) // 2))
+        chosen = set()
+        while len(chosen) < k:
+            item = self.sample()
+            if item != exclude:
+                chosen.add(item)
+        return chosen
+
+
+class Writer:
+    """
+    Buffer rows of one model and insert them in batches, with COPY on
+    PostgreSQL and bulk_create elsewhere.
+    """
+
+    def __init__(self, model, fields, batch_size, use_copy):
+        self.model = model
+        self.fields = fields
+        self.batch_size = batch_size
+        self.use_copy = use_copy
+        self.rows = []
+        self.count = 0
+        self.elapsed = 0.0
+
+    def add(self, *row):
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        start = time.perf_counter()
+        if self.use_copy:
+            self.copy()
+        else:
+            self.model.objects.bulk_create(
+                (
+                    self.model(**dict(zip(self.fields, row)))
+                    for row in self.rows
+                ),
+                batch_size=self.batch_size,
+            )
+        self.elapsed += time.perf_counter() - start
+        self.count += len(self.rows)
+        self.rows = []
+
+    def copy(self):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in self.rows:
+            writer.writerow(
+                json.dumps(value) if isinstance(value, dict) else value
+                for value in row
+            )
+        buffer.seek(0)
+        meta = self.model._meta
+        columns = ", ".join(
+            connection.ops.quote_name(meta.get_field(field).column)
+            for field in self.fields
+        )
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {connection.ops.quote_name(meta.db_table)} "
+                f"({columns}) FROM STDIN WITH (FORMAT csv)",
+                buffer,
+            )
+
+
+@contextmanager
+def manual_dates(model):
+    """
+    Let bulk_create keep explicit auto_now and auto_now_add values.
+    """
+    fields = [
+        field
+        for field in model._meta.concrete_fields
+        if getattr(field, "auto_now", False)
+        or getattr(field, "auto_now_add", False)
+    ]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def next_id(model):
+    return (model.objects.aggregate(last=Max("pk"))["last"] or 0) + 1
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a reproducible synthetic dataset: users, tags, recipes "
+        "with Zipfian authors, ingredients and tags, and follower, "
+        "favorite and shopping cart edges favouring popular authors and "
+        "recipes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=10000)
+        parser.add_argument(
+            "--users", type=int, help="Defaults to a tenth of --recipes."
+        )
+        parser.add_argument("--tags", type=int, default=20)
+        parser.add_argument("--ingredients", type=int, default=2000)
+        parser.add_argument("--ingredients-per-recipe", type=int, default=8)
+        parser.add_argument("--follows-per-user", type=int, default=10)
+        parser.add_argument("--favorites-per-user", type=int, default=20)
+        parser.add_argument("--cart-per-user", type=int, default=3)
+        parser.add_argument(
+            "--zipf", type=float, default=1.1, help="Zipf exponent."
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--no-copy",
+            action="store_true",
+            help="Use bulk_create on PostgreSQL too.",
+        )
+
+    def count(self, average):
+        """
+        Per-row edge count, skewed so that most rows have a few edges.
+        """
+        if average <= 0:
+            return 0
+        return min(int(self.rng.expovariate(1 / average)), average * 10)
+
+    def writer(self, model, fields):
+        return Writer(model, fields, self.batch_size, self.use_copy)
+
+    def report(self, writer):
+        self.stdout.write(
+            f"{writer.model._meta.label}: {writer.count} rows in "
+            f"{writer.elapsed:.2f} s "
+            f"({writer.count / max(writer.elapsed, 1e-9):.0f} rows/s)"
+        )
+
+    def get_image(self):
+        buffer = io.BytesIO()
+        Image.new("RGB", (640, 480), (200, 120, 60)).save(buffer, "JPEG")
+        content = buffer.getvalue()
+        return Recipe._meta.get_field("image").storage.save(
+            f"{hashlib.sha256(content).hexdigest()}.jpg", ContentFile(content)
+        )
+
+    def create_users(self, count):
+        first_id = next_id(User)
+        password = make_password("password")
+        now = datetime.utcnow()
+        writer = self.writer(
+            User,
+            [
+                "id",
+                "username",
+                "email",
+                "password",
+                "first_name",
+                "last_name",
+                "is_superuser",
+                "is_staff",
+                "is_active",
+                "date_joined",
+                "shopping_cart_version",
+                "recipes_count",
+            ],
+        )
+        for i in range(count):
+            pk = first_id + i
+            writer.add(
+                pk,
+                f"seed{self.seed}_{i}",
+                f"seed{self.seed}_{i}@example.com",
+                password,
+                f"Имя{i}",
+                f"Фамилия{i}",
+                False,
+                False,
+                True,
+                now - timedelta(seconds=self.rng.randrange(365 * 86400)),
+                0,
+                0,
+            )
+        writer.flush()
+        self.report(writer)
+        return range(first_id, first_id + count)
+
+    def create_tags(self, count):
+        first_id = next_id(Tag)
+        writer = self.writer(Tag, ["id", "name", "color", "slug"])
+        for i in range(count):
+            pk = first_id + i
+            writer.add(
+                pk,
+                f"seed{self.seed} tag {i}",
+                f"#{(self.seed * 7919 + pk) % 0xFFFFFF:06X}",
+                f"seed{self.seed}-{i}",
+            )
+        writer.flush()
+        self.report(writer)
+        return range(first_id, first_id + count)
+
+    def get_ingredients(self, count):
+        ids = list(
+            Ingredient.objects.order_by("pk").values_list("pk", flat=True)
+        )
+        if ids:
+            return ids
+        first_id = next_id(Ingredient)
+        writer = self.writer(Ingredient, ["id", "name", "measurement_unit"])
+        units = ["г", "кг", "мл", "л", "шт", "ст. л.", "ч. л."]
+        for i in range(count):
+            writer.add(first_id + i, f"ингредиент {i}", units[i % len(units)])
+        writer.flush()
+        self.report(writer)
+        return list(range(first_id, first_id + count))
+
+    def create_recipes(self, count, authors, tags, ingredients):
+        first_id = next_id(Recipe)
+        image = self.get_image()
+        now = datetime.utcnow()
+        recipes = self.writer(
+            Recipe,
+            [
+                "id",
+                "author_id",
+                "name",
+                "image",
+                "image_variants",
+                "text",
+                "cooking_time",
+                "pub_date",
+                "modified_at",
+                "favorites_count",
+            ],
+        )
+        tag_recipes = self.writer(TagRecipe, ["recipe_id", "tag_id"])
+        ingredient_recipes = self.writer(
+            IngredientRecipe, ["recipe_id", "ingredient_id", "amount"]
+        )
+        for i in range(count):
+            pk = first_id + i
+            pub_date = now - timedelta(seconds=self.rng.randrange(365 * 86400))
+            recipes.add(
+                pk,
+                authors.sample(),
+                f"Рецепт {i}",
+                image,
+                {},
+                f"Описание рецепта {i}",
+                self.rng.randint(5, 180),
+                pub_date,
+                pub_date,
+                0,
+            )
+            for tag in tags.sample_distinct(self.rng.randint(1, 3)):
+                tag_recipes.add(pk, tag)
+            amount = max(1, self.count(self.ingredients_per_recipe))
+            for ingredient in ingredients.sample_distinct(amount):
+                ingredient_recipes.add(
+                    pk, ingredient, self.rng.randint(1, 50) * 10
+                )
+        for writer in (recipes, tag_recipes, ingredient_recipes):
+            writer.flush()
+            self.report(writer)
+        return range(first_id, first_id + count)
+
+    def create_edges(self, users, authors, recipes, options):
+        followers = self.writer(Follower, ["follower_id", "author_id"])
+        favorites = self.writer(Favorite, ["user_id", "recipe_id"])
+        cart = self.writer(ShoppingCart, ["user_id", "recipe_id"])
+        for user in users:
+            follows = self.count(options["follows_per_user"])
+            for author in authors.sample_distinct(follows, exclude=user):
+                followers.add(user, author)
+            for recipe in recipes.sample_distinct(
+                self.count(options["favorites_per_user"])
+            ):
+                favorites.add(user, recipe)
+            for recipe in recipes.sample_distinct(
+                self.count(options["cart_per_user"])
+            ):
+                cart.add(user, recipe)
+        for writer in (followers, favorites, cart):
+            writer.flush()
+            self.report(writer)
+
+    def handle(self, *args, **options):
+        self.seed = options["seed"]
+        self.rng = random.Random(self.seed)
+        self.batch_size = options["batch_size"]
+        self.use_copy = (
+            connection.vendor == "postgresql" and not options["no_copy"]
+        )
+        self.ingredients_per_recipe = options["ingredients_per_recipe"]
+        recipes_count = options["recipes"]
+        users_count = options["users"] or max(2, recipes_count // 10)
+        if User.objects.filter(username=f"seed{self.seed}_0").exists():
+            raise CommandError(
+                f"Seed {self.seed} is already loaded, pick another --seed"
+            )
+        start = time.perf_counter()
+        with transaction.atomic(), manual_dates(Recipe):
+            users = self.create_users(users_count)
+            tags = self.create_tags(options["tags"])
+            ingredients = self.get_ingredients(options["ingredients"])
+            zipf = options["zipf"]
+            authors = ZipfSampler(self.rng, users, zipf)
+            recipes = self.create_recipes(
+                recipes_count,
+                authors,
+                ZipfSampler(self.rng, tags, zipf),
+                ZipfSampler(self.rng, ingredients, zipf),
+            )
+            self.create_edges(
+                users, authors, ZipfSampler(self.rng, recipes, zipf), options
+            )
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(
+                    no_style(), [User, Tag, Ingredient, Recipe]
+                ):
+                    cursor.execute(sql)
+            rebuild_search_index()
+            call_command(
+                "reconcile_counters",
+                batch_size=max(self.batch_size, 10000),
+                stdout=self.stdout,
+            )
+            rebuild_feed()
+            rebuild_popularity()
+        self.stdout.write(
+            f"generated in {time.perf_counter() - start:.2f} s, seed "
+            f"{self.seed}"
+        )
@@ -0,0 +1,106 @@
+import hashlib
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from recipes.images import get_targets, render_variants, store_variants
+from recipes.models import Recipe
+
+HASHED_NAME = re.compile(r"^[0-9a-f]{64}\.\w+$")
+
+
+class Command(BaseCommand):
+    help = (
+        "Rename recipe images after their content hash, so duplicates "
+        "share one file, and generate the missing image variants."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, default=settings.IMAGE_VARIANT_WORKERS
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Regenerate the variants of every image.",
+        )
+        parser.add_argument(
+            "--delete-originals",
+            action="store_true",
+            help="Delete the files replaced by their content hashed copy.",
+        )
+
+    def rehash(self, storage, name, delete_original):
+        with storage.open(name) as f:
+            content = f.read()
+        extension = os.path.splitext(name)[1].lower()
+        hashed = storage.save(
+            hashlib.sha256(content).hexdigest() + extension,
+            ContentFile(content),
+        )
+        Recipe.objects.filter(image=name).update(
+            image=hashed, image_variants={}
+        )
+        if delete_original:
+            storage.delete(name)
+        return hashed
+
+    def rehash_all(self, storage, delete_originals):
+        renamed = 0
+        for name in (
+            Recipe.objects.exclude(image="")
+            .values_list("image", flat=True)
+            .distinct()
+        ):
+            if not HASHED_NAME.match(name) and storage.exists(name):
+                self.rehash(storage, name, delete_originals)
+                renamed += 1
+        return renamed
+
+    def get_names(self, storage, force):
+        queryset = Recipe.objects.exclude(image="")
+        if not force:
+            queryset = queryset.exclude(
+                image_variants__has_keys=list(settings.IMAGE_VARIANTS)
+            )
+        names = [
+            name
+            for name in queryset.values_list("image", flat=True).distinct()
+            if storage.exists(name)
+        ]
+        if force:
+            for name in names:
+                for path, _, _ in get_targets(storage, name).values():
+                    if os.path.exists(path):
+                        os.remove(path)
+        return names
+
+    def handle(self, *args, **options):
+        storage = Recipe._meta.get_field("image").storage
+        renamed = self.rehash_all(storage, options["delete_originals"])
+        self.stdout.write(f"renamed {renamed} images")
+        names = self.get_names(storage, options["force"])
+        failed = 0
+        with ProcessPoolExecutor(max_workers=options["workers"] or 1) as pool:
+            futures = {
+                pool.submit(
+                    render_variants,
+                    storage.path(name),
+                    get_targets(storage, name),
+                ): name
+                for name in names
+            }
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    store_variants(name, future.result())
+                except Exception as error:
+                    failed += 1
+                    self.stderr.write(f"{name}: {error}")
+        self.stdout.write(
+            f"generated variants of {len(names) - failed} images, "
+            f"{failed} failed"
+        )
@@ -0,0 +1,87 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from recipes.models import Favorite, Recipe
+from users.models import Follower, User
+
+
+def count_of(queryset, field):
+    """
+    Correlated subquery counting the rows of queryset per ``field``.
+    """
+    return Coalesce(
+        Subquery(
+            queryset.order_by()
+            .values(field)
+            .annotate(count=Count("pk"))
+            .values("count")
+        ),
+        0,
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount Recipe.favorites_count, User.recipes_count and "
+        "User.followers_count and fix the rows that drifted, one batch of "
+        "primary keys at a time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report drifted rows without updating them.",
+        )
+
+    def get_counters(self):
+        return [
+            (
+                Recipe,
+                "favorites_count",
+                count_of(
+                    Favorite.objects.filter(recipe=OuterRef("pk")), "recipe"
+                ),
+            ),
+            (
+                User,
+                "recipes_count",
+                count_of(
+                    Recipe.objects.filter(author=OuterRef("pk")), "author"
+                ),
+            ),
+            (
+                User,
+                "followers_count",
+                count_of(
+                    Follower.objects.filter(author=OuterRef("pk")), "author"
+                ),
+            ),
+        ]
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        for model, field, actual in self.get_counters():
+            drifted = 0
+            last_pk = 0
+            while True:
+                pks = list(
+                    model.objects.filter(pk__gt=last_pk)
+                    .order_by("pk")
+                    .values_list("pk", flat=True)[:batch_size]
+                )
+                if not pks:
+                    break
+                last_pk = pks[-1]
+                queryset = model.objects.filter(pk__in=pks).exclude(
+                    **{field: actual}
+                )
+                if options["dry_run"]:
+                    drifted += queryset.count()
+                else:
+                    drifted += queryset.update(**{field: actual})
+            self.stdout.write(
+                f"{model._meta.label}.{field}: {drifted} drifted rows"
+                + (" found" if options["dry_run"] else " fixed")
+            )
@@ -0,0 +1,41 @@
+# Generated by Django 3.2.15 on 2026-10-18 01:54
+
+from django.db import migrations, models
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model("recipes", "Ingredient")
+    IngredientRecipe = apps.get_model("recipes", "IngredientRecipe")
+    duplicates = (
+        Ingredient.objects.values("name", "measurement_unit")
+        .annotate(min_id=models.Min("id"), count=models.Count("id"))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates:
+        extra = Ingredient.objects.filter(
+            name=duplicate["name"],
+            measurement_unit=duplicate["measurement_unit"],
+        ).exclude(id=duplicate["min_id"])
+        IngredientRecipe.objects.filter(ingredient__in=extra).update(
+            ingredient_id=duplicate["min_id"]
+        )
+        extra.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0004_ingredient_name_prefix_idx"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name="ingredient",
+            constraint=models.UniqueConstraint(
+                fields=("name", "measurement_unit"), name="unique_ingredient"
+            ),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.2.15 on 2026-10-18 01:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0005_unique_ingredient"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="favorite",
+            index=models.Index(
+                fields=["user", "recipe"], name="favorite_user_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["-pub_date"], name="recipe_pub_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="shoppingcart",
+            index=models.Index(
+                fields=["user", "recipe"], name="shopping_cart_user_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tagrecipe",
+            index=models.Index(
+                fields=["tag", "recipe"], name="tag_recipe_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 3.2.15 on 2026-10-18 02:01
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Favorite = apps.get_model("recipes", "Favorite")
+    Recipe = apps.get_model("recipes", "Recipe")
+    User = apps.get_model("users", "User")
+    Recipe.objects.update(
+        favorites_count=Coalesce(
+            models.Subquery(
+                Favorite.objects.filter(recipe=models.OuterRef("pk"))
+                .order_by()
+                .values("recipe")
+                .annotate(count=models.Count("pk"))
+                .values("count")
+            ),
+            0,
+        )
+    )
+    User.objects.update(
+        recipes_count=Coalesce(
+            models.Subquery(
+                Recipe.objects.filter(author=models.OuterRef("pk"))
+                .order_by()
+                .values("author")
+                .annotate(count=models.Count("pk"))
+                .values("count")
+            ),
+            0,
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0008_recipe_modified_at"),
+        ("users", "0004_user_recipes_count"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="favorites_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 3.2.15 on 2026-10-18 02:10
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == "postgresql":
+        schema_editor.execute(
+            "CREATE INDEX recipe_search_vector_idx ON recipes_recipe "
+            "USING gin (search_vector)"
+        )
+        schema_editor.execute(
+            "UPDATE recipes_recipe SET search_vector = "
+            "setweight(to_tsvector(%s::regconfig, coalesce(name, '')), 'A')"
+            " || "
+            "setweight(to_tsvector(%s::regconfig, coalesce(text, '')), 'B')",
+            [settings.SEARCH_CONFIG, settings.SEARCH_CONFIG],
+        )
+    elif connection.vendor == "sqlite":
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE recipes_recipe_fts USING fts5("
+            "name, text, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            "INSERT INTO recipes_recipe_fts (rowid, name, text) "
+            "SELECT id, name, text FROM recipes_recipe"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS recipe_search_vector_idx")
+    elif connection.vendor == "sqlite":
+        schema_editor.execute("DROP TABLE IF EXISTS recipes_recipe_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0010_recipe_image_variants"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
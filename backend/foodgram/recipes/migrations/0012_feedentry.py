@@ -0,0 +1,87 @@
+# Generated by Django 3.2.15 on 2026-10-18 02:13
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models.functions import Coalesce
+
+
+def fill_feed(apps, schema_editor):
+    Follower = apps.get_model("users", "Follower")
+    User = apps.get_model("users", "User")
+    User.objects.update(
+        followers_count=Coalesce(
+            models.Subquery(
+                Follower.objects.filter(author=models.OuterRef("pk"))
+                .order_by()
+                .values("author")
+                .annotate(count=models.Count("pk"))
+                .values("count")
+            ),
+            0,
+        )
+    )
+    schema_editor.execute(
+        "INSERT INTO recipes_feedentry (user_id, recipe_id, pub_date) "
+        "SELECT follower.follower_id, recipe.id, recipe.pub_date "
+        "FROM users_follower follower "
+        "JOIN users_user author ON author.id = follower.author_id "
+        "JOIN recipes_recipe recipe ON recipe.author_id = author.id "
+        "WHERE author.followers_count <= %s",
+        [settings.FEED_FANOUT_LIMIT],
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("recipes", "0011_recipe_search"),
+        ("users", "0005_user_followers_count"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FeedEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("pub_date", models.DateTimeField()),
+                (
+                    "recipe",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="feed_entries",
+                        to="recipes.recipe",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="feed",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="feedentry",
+            index=models.Index(
+                fields=["user", "-pub_date", "-recipe"],
+                name="feed_user_pub_date_idx",
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="feedentry",
+            unique_together={("user", "recipe")},
+        ),
+        migrations.RunPython(fill_feed, migrations.RunPython.noop),
+    ]
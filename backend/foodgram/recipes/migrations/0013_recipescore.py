@@ -0,0 +1,69 @@
+# Generated by Django 3.2.15 on 2026-10-18 02:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.conf import settings
+from django.utils import timezone
+
+
+def fill_scores(apps, schema_editor):
+    weights = settings.POPULARITY_WEIGHTS
+    schema_editor.execute(
+        "INSERT INTO recipes_recipescore "
+        "(recipe_id, score_24h, score_7d, score_all, updated_at) "
+        "SELECT id, score, score, score, %s FROM ("
+        "SELECT recipe.id, "
+        "recipe.favorites_count * %s + ("
+        "SELECT COUNT(*) FROM recipes_shoppingcart cart "
+        "WHERE cart.recipe_id = recipe.id) * %s AS score "
+        "FROM recipes_recipe recipe) scores",
+        [timezone.now(), weights["favorite"], weights["shopping_cart"]],
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0012_feedentry"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RecipeScore",
+            fields=[
+                (
+                    "recipe",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="score",
+                        serialize=False,
+                        to="recipes.recipe",
+                    ),
+                ),
+                ("score_24h", models.FloatField(default=0)),
+                ("score_7d", models.FloatField(default=0)),
+                ("score_all", models.FloatField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="recipescore",
+            index=models.Index(
+                fields=["-score_24h", "-recipe"], name="recipe_score_24h_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipescore",
+            index=models.Index(
+                fields=["-score_7d", "-recipe"], name="recipe_score_7d_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipescore",
+            index=models.Index(
+                fields=["-score_all", "-recipe"], name="recipe_score_all_idx"
+            ),
+        ),
+        migrations.RunPython(fill_scores, migrations.RunPython.noop),
+    ]
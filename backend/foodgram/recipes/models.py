@@ -1,7 +1,10 @@
 from colorfield.fields import ColorField
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
-from users.models import User
+from users.models import PreserveDenormalizedFieldsMixin, User
+
+from .images import ContentAddressedStorage
 
 
 class Tag(models.Model):
@@ -14,19 +17,51 @@ class Ingredient(models.Model):
     name = models.CharField(max_length=128)
     measurement_unit = models.CharField(max_length=32)
 
-
-class Recipe(models.Model):
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["name"],
+                name="ingredient_name_prefix_idx",
+                opclasses=["varchar_pattern_ops"],
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["name", "measurement_unit"],
+                name="unique_ingredient",
+            ),
+        ]
+
+
+class Recipe(PreserveDenormalizedFieldsMixin, models.Model):
     author = models.ForeignKey(
         User, related_name="recipes", on_delete=models.CASCADE
     )
     name = models.CharField(max_length=200)
-    image = models.ImageField()
+    image = models.ImageField(storage=ContentAddressedStorage())
+    image_variants = models.JSONField(default=dict, editable=False)
+    # Kept by recipes.search, the GIN index is created by migration 0011
+    # on PostgreSQL only. SQLite searches an FTS5 table instead.
+    search_vector = SearchVectorField(null=True, editable=False)
     text = models.TextField()
     cooking_time = models.IntegerField(validators=[MinValueValidator(1)])
     pub_date = models.DateTimeField(auto_now_add=True)
+    modified_at = models.DateTimeField(auto_now=True)
+    favorites_count = models.PositiveIntegerField(default=0, editable=False)
+
+    denormalized_fields = ("search_vector", "favorites_count")
 
     class Meta:
         ordering = ["-pub_date"]
+        indexes = [
+            models.Index(
+                fields=["-pub_date", "-id"], name="recipe_pub_date_id_idx"
+            ),
+            models.Index(
+                fields=["author", "-pub_date"],
+                name="recipe_author_pub_date_idx",
+            ),
+        ]
 
 
 class TagRecipe(models.Model):
@@ -39,6 +74,9 @@ class TagRecipe(models.Model):
 
     class Meta:
         unique_together = ("recipe", "tag")
+        indexes = [
+            models.Index(fields=["tag", "recipe"], name="tag_recipe_idx"),
+        ]
 
 
 class IngredientRecipe(models.Model):
@@ -61,6 +99,11 @@ class ShoppingCart(models.Model):
 
     class Meta:
         unique_together = ("recipe", "user")
+        indexes = [
+            models.Index(
+                fields=["user", "recipe"], name="shopping_cart_user_idx"
+            ),
+        ]
 
 
 class Favorite(models.Model):
@@ -73,3 +116,61 @@ class Favorite(models.Model):
 
     class Meta:
         unique_together = ("recipe", "user")
+        indexes = [
+            models.Index(fields=["user", "recipe"], name="favorite_user_idx"),
+        ]
+
+
+class FeedEntry(models.Model):
+    """
+    Recipe in the timeline of a follower of its author, written when the
+    recipe is published or the author is followed.
+    """
+
+    user = models.ForeignKey(
+        User, related_name="feed", on_delete=models.CASCADE
+    )
+    recipe = models.ForeignKey(
+        Recipe, related_name="feed_entries", on_delete=models.CASCADE
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        unique_together = ("user", "recipe")
+        indexes = [
+            models.Index(
+                fields=["user", "-pub_date", "-recipe"],
+                name="feed_user_pub_date_idx",
+            ),
+        ]
+
+
+class RecipeScore(models.Model):
+    """
+    Popularity of a recipe from favorites and shopping carts. The trending
+    scores decay over time, see recipes.popularity.
+    """
+
+    recipe = models.OneToOneField(
+        Recipe,
+        primary_key=True,
+        related_name="score",
+        on_delete=models.CASCADE,
+    )
+    score_24h = models.FloatField(default=0)
+    score_7d = models.FloatField(default=0)
+    score_all = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["-score_24h", "-recipe"], name="recipe_score_24h_idx"
+            ),
+            models.Index(
+                fields=["-score_7d", "-recipe"], name="recipe_score_7d_idx"
+            ),
+            models.Index(
+                fields=["-score_all", "-recipe"], name="recipe_score_all_idx"
+            ),
+        ]
@@ -0,0 +1,113 @@
+import math
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import RecipeScore
+
+# Time constants of the exponential decay of the trending scores, in
+# hours. A contribution weighs 1/e of its weight after one window.
+WINDOWS = {"score_24h": 24, "score_7d": 24 * 7}
+
+SCORE_FIELDS = ("score_24h", "score_7d", "score_all")
+
+# Values of the ordering query parameter and the score they sort by.
+ORDERINGS = {
+    "popular": "score_all",
+    "popular_all": "score_all",
+    "popular_7d": "score_7d",
+    "popular_24h": "score_24h",
+}
+
+
+def add_score(recipe_id, weight):
+    """
+    Add ``weight`` to every score of the recipe.
+    """
+    RecipeScore.objects.filter(recipe=recipe_id).update(
+        updated_at=timezone.now(),
+        **{field: F(field) + weight for field in SCORE_FIELDS},
+    )
+
+
+def remove_score(recipe_id, weight):
+    """
+    Take ``weight`` back from the all-time score of the recipe, never below
+    zero. The trending scores are left to decay, they only hold what is
+    left of the weight and subtracting all of it would undercount the
+    other contributions.
+    """
+    RecipeScore.objects.filter(recipe=recipe_id).update(
+        updated_at=timezone.now(),
+        score_all=Greatest(F("score_all") - weight, Value(0.0)),
+    )
+
+
+def decay(hours, batch_size=10000):
+    """
+    Decay the trending scores by ``hours`` of elapsed time, one batch of
+    recipes at a time. Returns the number of updated rows.
+    """
+    factors = {
+        field: math.exp(-hours / window) for field, window in WINDOWS.items()
+    }
+    now = timezone.now()
+    updated = 0
+    last_pk = 0
+    while True:
+        pks = list(
+            RecipeScore.objects.filter(pk__gt=last_pk)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not pks:
+            return updated
+        last_pk = pks[-1]
+        updated += (
+            RecipeScore.objects.filter(pk__in=pks)
+            .exclude(score_24h=0, score_7d=0)
+            .update(
+                updated_at=now,
+                **{
+                    field: F(field) * factor
+                    for field, factor in factors.items()
+                },
+            )
+        )
+        for field in WINDOWS:
+            RecipeScore.objects.filter(
+                pk__in=pks, **{f"{field}__lt": settings.POPULARITY_EPSILON}
+            ).exclude(**{field: 0}).update(**{field: 0})
+
+
+def rebuild_popularity():
+    """
+    Score every recipe from its current favorites and shopping carts, for
+    rows written without signals. The trending scores start out equal to
+    the all-time score.
+    """
+    weights = settings.POPULARITY_WEIGHTS
+    # Readers keep the old scores until the new ones are committed. Rows
+    # of recipes created meanwhile are left as their signal wrote them.
+    with transaction.atomic(), connection.cursor() as cursor:
+        RecipeScore.objects.all().delete()
+        cursor.execute(
+            "INSERT INTO recipes_recipescore "
+            "(recipe_id, score_24h, score_7d, score_all, updated_at) "
+            "SELECT id, score, score, score, %s FROM ("
+            "SELECT recipe.id, "
+            "recipe.favorites_count * %s + ("
+            "SELECT COUNT(*) FROM recipes_shoppingcart cart "
+            "WHERE cart.recipe_id = recipe.id) * %s AS score "
+            "FROM recipes_recipe recipe WHERE NOT EXISTS ("
+            "SELECT 1 FROM recipes_recipescore existing "
+            "WHERE existing.recipe_id = recipe.id)) scores",
+            [
+                timezone.now(),
+                weights["favorite"],
+                weights["shopping_cart"],
+            ],
+        )
@@ -0,0 +1,110 @@
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connection
+from django.db.models import F, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = "recipes_recipe_fts"
+
+WORD = re.compile(r"\w+")
+
+
+def search_vector():
+    config = settings.SEARCH_CONFIG
+    return SearchVector("name", weight="A", config=config) + SearchVector(
+        "text", weight="B", config=config
+    )
+
+
+def fts_query(text):
+    """
+    FTS5 query matching every word of ``text`` as a prefix, user input is
+    never passed to MATCH as syntax.
+    """
+    return " ".join(f'"{word}"*' for word in WORD.findall(text.lower()))
+
+
+def update_search_index(recipe):
+    from .models import Recipe
+
+    if connection.vendor == "postgresql":
+        Recipe.objects.filter(pk=recipe.pk).update(
+            search_vector=search_vector()
+        )
+    elif connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [recipe.pk]
+            )
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, name, text) "
+                "VALUES (%s, %s, %s)",
+                [recipe.pk, recipe.name, recipe.text],
+            )
+
+
+def delete_from_search_index(pk):
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [pk])
+
+
+def rebuild_search_index():
+    """
+    Index every recipe again, for rows written without signals.
+    """
+    from .models import Recipe
+
+    if connection.vendor == "postgresql":
+        Recipe.objects.update(search_vector=search_vector())
+    elif connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, name, text) "
+                "SELECT id, name, text FROM recipes_recipe"
+            )
+
+
+def search_recipes(queryset, text):
+    """
+    Keep the recipes matching ``text`` and order them by relevance, best
+    first, with search_rank annotated.
+    """
+    if connection.vendor == "postgresql":
+        query = SearchQuery(
+            text, config=settings.SEARCH_CONFIG, search_type="websearch"
+        )
+        return (
+            queryset.filter(search_vector=query)
+            .annotate(search_rank=SearchRank(F("search_vector"), query))
+            .order_by("-search_rank", "-pub_date", "-id")
+        )
+    if connection.vendor == "sqlite":
+        match = fts_query(text)
+        if not match:
+            return queryset.none()
+        table = queryset.model._meta.db_table
+        return (
+            queryset.filter(
+                pk__in=RawSQL(
+                    f"SELECT rowid FROM {FTS_TABLE} "
+                    f"WHERE {FTS_TABLE} MATCH %s",
+                    [match],
+                )
+            )
+            .annotate(
+                search_rank=RawSQL(
+                    f"SELECT -bm25({FTS_TABLE}, 10.0, 1.0) FROM {FTS_TABLE} "
+                    f"WHERE {FTS_TABLE} MATCH %s "
+                    f"AND {FTS_TABLE}.rowid = {table}.id",
+                    [match],
+                    output_field=FloatField(),
+                )
+            )
+            .order_by("-search_rank", "-pub_date", "-id")
+        )
+    return queryset.filter(Q(name__icontains=text) | Q(text__icontains=text))
@@ -0,0 +1,229 @@
+from contextlib import contextmanager
+from threading import local
+
+from django.conf import settings
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from users.models import Follower, User
+
+from .feed import backfill, fan_out, prune
+from .models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                     RecipeScore, ShoppingCart, Tag, TagRecipe)
+from .popularity import add_score, remove_score
+from .search import delete_from_search_index, update_search_index
+
+_batch = local()
+
+
+def bump_shopping_cart_version(**lookup):
+    """
+    Invalidate the generated shopping lists of the matching users.
+    """
+    User.objects.filter(**lookup).update(
+        shopping_cart_version=F("shopping_cart_version") + 1
+    )
+
+
+def touch_recipes(**lookup):
+    """
+    Mark the matching recipes as modified for conditional requests.
+    """
+    Recipe.objects.filter(**lookup).update(modified_at=timezone.now())
+
+
+def touch_user_relations(user_id, **fields):
+    """
+    Mark the favorites, shopping cart or subscriptions of the user as
+    modified, they are part of every recipe the user sees.
+    """
+    User.objects.filter(pk=user_id).update(
+        relations_modified_at=timezone.now(), **fields
+    )
+
+
+@contextmanager
+def batch_recipe_changes():
+    """
+    Suspend the per-row receivers of IngredientRecipe and TagRecipe while
+    the caller updates the recipe itself.
+    """
+    _batch.active = True
+    try:
+        yield
+    finally:
+        _batch.active = False
+
+
+@contextmanager
+def batch_shopping_cart_version(**lookup):
+    """
+    Bump the matching users once after a batch of IngredientRecipe changes
+    instead of once per changed row.
+    """
+    with batch_recipe_changes():
+        yield
+    bump_shopping_cart_version(**lookup)
+
+
+def is_deleting(recipe_id):
+    """
+    Whether the recipe is being deleted, its cascade is handled once by
+    recipe_deleting instead of per row.
+    """
+    return recipe_id in getattr(_batch, "deleting", ())
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleting(sender, instance, **kwargs):
+    """
+    Invalidate the users who favorited the recipe or have it in their
+    shopping cart once, before the cascade deletes their rows.
+    """
+    if not hasattr(_batch, "deleting"):
+        _batch.deleting = set()
+    _batch.deleting.add(instance.pk)
+    now = timezone.now()
+    User.objects.filter(shopping_cart__recipe=instance).update(
+        relations_modified_at=now,
+        shopping_cart_version=F("shopping_cart_version") + 1,
+    )
+    User.objects.filter(favorite__recipe=instance).update(
+        relations_modified_at=now
+    )
+
+
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def shopping_cart_changed(sender, instance, **kwargs):
+    if is_deleting(instance.recipe_id):
+        return
+    touch_user_relations(
+        instance.user_id,
+        shopping_cart_version=F("shopping_cart_version") + 1,
+    )
+
+
+@receiver(post_save, sender=ShoppingCart)
+def shopping_cart_created(sender, instance, created, **kwargs):
+    if created:
+        add_score(
+            instance.recipe_id, settings.POPULARITY_WEIGHTS["shopping_cart"]
+        )
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def shopping_cart_deleted(sender, instance, **kwargs):
+    if is_deleting(instance.recipe_id):
+        return
+    remove_score(
+        instance.recipe_id, settings.POPULARITY_WEIGHTS["shopping_cart"]
+    )
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+def favorite_changed(sender, instance, **kwargs):
+    if is_deleting(instance.recipe_id):
+        return
+    touch_user_relations(instance.user_id)
+
+
+@receiver(post_save, sender=Favorite)
+def favorite_created(sender, instance, created, **kwargs):
+    if created:
+        Recipe.objects.filter(pk=instance.recipe_id).update(
+            favorites_count=F("favorites_count") + 1
+        )
+        add_score(instance.recipe_id, settings.POPULARITY_WEIGHTS["favorite"])
+
+
+@receiver(post_delete, sender=Favorite)
+def favorite_deleted(sender, instance, **kwargs):
+    if is_deleting(instance.recipe_id):
+        return
+    Recipe.objects.filter(pk=instance.recipe_id, favorites_count__gt=0).update(
+        favorites_count=F("favorites_count") - 1
+    )
+    remove_score(instance.recipe_id, settings.POPULARITY_WEIGHTS["favorite"])
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(sender, instance, created, **kwargs):
+    if created:
+        User.objects.filter(pk=instance.author_id).update(
+            recipes_count=F("recipes_count") + 1
+        )
+        RecipeScore.objects.create(recipe=instance)
+        fan_out(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    getattr(_batch, "deleting", set()).discard(instance.pk)
+    User.objects.filter(pk=instance.author_id, recipes_count__gt=0).update(
+        recipes_count=F("recipes_count") - 1
+    )
+    delete_from_search_index(instance.pk)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or {"name", "text"} & set(update_fields):
+        update_search_index(instance)
+
+
+@receiver(post_save, sender=Follower)
+@receiver(post_delete, sender=Follower)
+def follower_changed(sender, instance, **kwargs):
+    touch_user_relations(instance.follower_id)
+
+
+@receiver(post_save, sender=Follower)
+def follower_created(sender, instance, created, **kwargs):
+    if created:
+        User.objects.filter(pk=instance.author_id).update(
+            followers_count=F("followers_count") + 1
+        )
+        backfill(instance.follower_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follower)
+def follower_deleted(sender, instance, **kwargs):
+    User.objects.filter(pk=instance.author_id, followers_count__gt=0).update(
+        followers_count=F("followers_count") - 1
+    )
+    prune(instance.follower_id, instance.author_id)
+
+
+@receiver(post_save, sender=IngredientRecipe)
+@receiver(post_delete, sender=IngredientRecipe)
+def ingredient_recipe_changed(sender, instance, **kwargs):
+    if getattr(_batch, "active", False) or is_deleting(instance.recipe_id):
+        return
+    bump_shopping_cart_version(shopping_cart__recipe=instance.recipe_id)
+    touch_recipes(pk=instance.recipe_id)
+
+
+@receiver(post_save, sender=TagRecipe)
+@receiver(post_delete, sender=TagRecipe)
+def tag_recipe_changed(sender, instance, **kwargs):
+    if getattr(_batch, "active", False) or is_deleting(instance.recipe_id):
+        return
+    touch_recipes(pk=instance.recipe_id)
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_changed(sender, instance, created, **kwargs):
+    if not created:
+        bump_shopping_cart_version(
+            shopping_cart__recipe__ingredients__ingredient=instance.pk
+        )
+        touch_recipes(ingredients__ingredient=instance.pk)
+
+
+@receiver(post_save, sender=Tag)
+def tag_changed(sender, instance, created, **kwargs):
+    if not created:
+        touch_recipes(tags__tag=instance.pk)
@@ -4,6 +4,7 @@ from .models import Follower, User
 
 
 class UserAdmin(admin.ModelAdmin):
+    list_display = ("username", "email", "recipes_count")
     list_filter = ("email",)
 
 
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.15 on 2026-10-18 01:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="shopping_cart_version",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
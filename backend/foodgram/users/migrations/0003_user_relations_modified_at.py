@@ -0,0 +1,18 @@
+# Generated by Django 3.2.15 on 2026-10-18 02:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0002_user_shopping_cart_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="relations_modified_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
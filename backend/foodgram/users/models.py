@@ -6,7 +6,34 @@ from django.utils.translation import ugettext_lazy as _
 from .validators import validate_username
 
 
-class User(AbstractUser):
+class PreserveDenormalizedFieldsMixin:
+    """
+    Full saves leave out the columns in denormalized_fields. They are kept
+    by queryset updates in recipes.signals and recipes.search, and writing
+    back the value loaded at the start of the request would undo the
+    updates made since.
+    """
+
+    denormalized_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (
+            not self._state.adding
+            and not kwargs.get("force_insert")
+            and kwargs.get("update_fields") is None
+        ):
+            deferred = self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.denormalized_fields
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+
+
+class User(PreserveDenormalizedFieldsMixin, AbstractUser):
     username = models.CharField(
         _("username"),
         max_length=30,
@@ -35,6 +62,17 @@ class User(AbstractUser):
     password = models.CharField(_("password"), max_length=150)
     first_name = models.CharField(_("first name"), max_length=150)
     last_name = models.CharField(_("last name"), max_length=150)
+    shopping_cart_version = models.PositiveIntegerField(default=0)
+    relations_modified_at = models.DateTimeField(null=True, blank=True)
+    recipes_count = models.PositiveIntegerField(default=0, editable=False)
+    followers_count = models.PositiveIntegerField(default=0, editable=False)
+
+    denormalized_fields = (
+        "shopping_cart_version",
+        "relations_modified_at",
+        "recipes_count",
+        "followers_count",
+    )
 
 
 class Follower(models.Model):